@@ -7,14 +7,13 @@ Dependent on packages pyserial, Pmw
 """
 
 import time
-import re
-import datetime
 import os
 import subprocess
 from tkinter.filedialog import asksaveasfile
 from tkinter.filedialog import askopenfile
 from tkinter import messagebox
 import sys
+import argparse
 from tkinter import *
 import webbrowser
 
@@ -40,61 +39,15 @@ except ImportError:
         print(f"Failed to install pySerial: {e}")
         sys.exit()
     
-import serial.tools.list_ports
-    
-Version = "BP-1.0"
-
-def extract_vid_pid_from_hwid(hwid):
-    """Extract VID and PID from hardware ID string"""
-    if not hwid:
-        return None, None
-    # Look for VID pattern
-    vid_match = re.search(r'VID_([0-9A-Fa-f]{4})', hwid)
-    vid = vid_match.group(1).upper() if vid_match else None
-    # Look for PID pattern
-    pid_match = re.search(r'PID_([0-9A-Fa-f]{4})', hwid)
-    pid = pid_match.group(1).upper() if pid_match else None
-    return vid, pid
-
-def find_ports_by_vid_pid(target_vid, target_pid):
-    """Find COM ports by VID and PID combination"""
-    matching_ports = []
-    
-    try:
-        available_ports = serial.tools.list_ports.comports()    
-        for port in available_ports:
-            vid = None
-            pid = None
-            # Try to get VID/PID directly from pyserial
-            if hasattr(port, 'vid') and port.vid is not None:
-                vid = f"{port.vid:04X}"
-            if hasattr(port, 'pid') and port.pid is not None:
-                pid = f"{port.pid:04X}"
-            # If not available directly, parse from hardware ID
-            if not vid or not pid:
-                if port.hwid:
-                    parsed_vid, parsed_pid = extract_vid_pid_from_hwid(port.hwid)
-                    if parsed_vid and not vid:
-                        vid = parsed_vid
-                    if parsed_pid and not pid:
-                        pid = parsed_pid
-            
-            # Check if this port matches the target VID/PID
-            if vid == target_vid.upper() and pid == target_pid.upper():
-                matching_ports=port.device 
-    except Exception as e:
-        print(f"Error searching COM ports: {e}") 
-    return matching_ports
-
-def CMD(cmd):
-    global ser
-    cmd+="\n"							#add newline character
-    ser.write(cmd.encode('utf-8'))
-    xresp = str(ser.read_until(),'utf-8')
-    xresp2=xresp.replace("\r", "")		#strip off CR if present
-    xresp3=xresp2.replace("\n", "")		#strip off LF if present
-    return xresp3
+from loggerIO import find_ports_by_vid_pid, Bridge, AcqEngine, discoverPlates, describeStack
+from loggerIO import initPlates, bridgeSerial, loadTopology, saveTopology, TopologyCheck, readPlates, plateOf
+from loggerCHART import StripChart
+from loggerMODEL import Channel
+from loggerROW import NOT_DUE
+from loggerLOG import LogWriter, Rotation, RateLog, formatFor, CODECS, LAYOUTS, KEYFRAME_SECS
+from loggerLOG import STAMP_COLUMNS, READ_TIME_DEADBAND
 
+Version = "BP-1.0"
 
 ################################################################################
 ############### Start Program! #################################################
@@ -104,7 +57,7 @@ def CMD(cmd):
 # define options for opening or saving a log file
 newlogfile_opt = options = {}
 options['defaultextension'] = '.csv'
-options['filetypes'] = [('log files', '.csv')]
+options['filetypes'] = [('log files', '.csv'), ('binary log files', '.plb')]
 options['title'] = 'Open new log file'
 
 # define options for opening or saving an existing log file
@@ -125,7 +78,7 @@ def NewLogFile():
     if (Logging==False):
         fName=''
         fName=asksaveasfile(mode='w',**newlogfile_opt)
-        if ((fName!=None) and ('.csv' in fName.name)):
+        if ((fName!=None) and (('.csv' in fName.name) or ('.plb' in fName.name))):
             lfOpen=True   
 
 def NewSetupFile():
@@ -230,12 +183,19 @@ def NewSetupFile():
                     
         # setup = setup + str(AoutSignal.get()) + ',' + str(DoutSignal.get())+ ','
         setup = setup + SampleCount.get() + ',' + SamplePeriod.get()
+        for dash in rateDashes():       #older setup files end at the sample period
+            setup = setup + ',' + dash.every.get()
+        for dash in rateDashes():
+            setup = setup + ',' + dash.deadband.get()
         sufile.write(setup)
         sufile.write('\n')      
         sufile.close()
 
 
 def OpenSetupFile():
+    if (Logging):
+        messagebox.showerror('Setup File','The channel selection can not be changed while logging')
+        return
     suFilename = askopenfile(**setupfile_opt)
     if ((suFilename != None) and ('.stp' in suFilename.name)):    
         sufile=open(suFilename.name,'r')
@@ -331,9 +291,16 @@ def OpenSetupFile():
                     k+=40
             SampleCount.set(setupList[k])
             SamplePeriod.set(setupList[k+1]) 
+            rates=setupList[k+2:]
+            dashes=rateDashes()
+            for n in range(min(len(rates),len(dashes))):
+                dashes[n].every.set(rates[n])
+            bands=rates[len(dashes):]
+            for n in range(min(len(bands),len(dashes))):
+                dashes[n].deadband.set(bands[n])
             
 def StartLog():
-    global logFile, lfOpen, Logging, fName, SampleC, logHeader, DAQC2o, THERMOo
+    global logFile, lfOpen, Logging, fName, SampleC, logHeader, DAQC2o, THERMOo, Continuous
     if ((lfOpen) and  (Logging==False)):
         root.wm_title("Pi-Plates Data Logger - LOGGING")
 
@@ -394,15 +361,55 @@ def StartLog():
                 for k in range(4):
                     if (desc[k] != ''):
                         Header= Header+'ADC-'+str(i)+'-'+desc[k]+','                        
+        for i in range(8):
+            if (DIGIpresent[i]==1):
+                desc=['','','','','','','','']
+                desc=DIGIo[i].dinDescriptors()
+                for k in range(8):
+                    if (desc[k] != ''):
+                        Header= Header+'DIGI-'+str(i)+'-'+desc[k]+','
 
         Header = Header[:-1] 
         logHeader=Header
+        if (planDirty):
+            buildPlan()
         if (lfOpen):
-            logFile=open(fName.name,'w')
-            logFile.write(Header)
-            logFile.write('\n')    
+            rotation=logRotation()
+            codec=CODECS.get(LogCodec.get(),CODECS['none'])
+            multiRate=any(ch.model.every>1 for ch in planChans)
+            if (rotation.enabled() or codec.ext or (multiRate and LogLayout.get()=='streams')):
+                fName.close()       #only numbered segments, a manifest, the compressed file or rate streams are written
+                if (os.path.getsize(fName.name)==0):
+                    os.remove(fName.name)
+            names=Header.split(',')[1:]
+            types=['i1' if ch.model.conv==int else 'f8' for ch in planChans]
+            every=[ch.model.every for ch in planChans]
+            bands=[ch.model.deadband for ch in planChans]
+            if (planSkew):      #the engine appends one read time per plate after the channels
+                for plate in readPlates([ch.readCmd() for ch in planChans]):
+                    names.append(plate+'-Read Time')
+                    types.append('f8')
+                    every.append(min(ch.model.every for ch in planChans if plateOf(ch.readCmd())==plate))
+                    bands.append(READ_TIME_DEADBAND)
+            deadband=None
+            if (LogChanges.get()=='on'):
+                deadband=bands
+            if (multiRate):
+                logFile=RateLog(fName.name,names,types,every,LogLayout.get(),*logPolicy(),deadband=deadband,
+                                keyframeSecs=keyframeSecs(),stamps=LogStamps.get(),rotation=rotation,codec=codec)
+            else:
+                fmt=formatFor(fName.name,names,types,deadband,keyframeSecs(),LogStamps.get())
+                logFile=LogWriter(fName.name,fmt,*logPolicy(),rotation=rotation,codec=codec)
         Logging=True   
-        SampleC=int(SampleCount.get())
+        lockControls(True)
+        try:
+            SampleC=int(SampleCount.get())
+        except ValueError:
+            SampleC=0
+        Continuous=(SampleC<=0)     #a sample count of 0 logs until STOP is pressed
+        if (Continuous):
+            SampleC=0
+        engine.resetStats()
     else:
         messagebox.showerror(
             "Logging",
@@ -413,10 +420,21 @@ def StopLog():
     global logFile, lfOpen, Logging
     if (Logging):
         Logging=False
+        lockControls(False)
         root.wm_title("Pi-Plates Data Logger")
         if (lfOpen):
             logFile.close()
             lfOpen=False
+            print("Log writer: "+str(logFile.written)+" rows in "+str(logFile.batches)+" writes, write time mean/max "
+                  +str(round(logFile.meanWrite()*1000,3))+"/"+str(round(logFile.maxWrite*1000,3))+" ms")
+        ticks,overruns,skipped,jitter,meanJitter,maxJitter=engine.stats()
+        print("Logging stopped: "+str(ticks)+" samples, "+str(overruns)+" overruns, "+str(skipped)+" skipped samples, jitter mean/max "
+              +str(round(meanJitter*1000,3))+"/"+str(round(maxJitter*1000,3))+" ms")
+        print("BRIDGEplate: "+str(bridge.misses)+" missed replies, "+str(bridge.failed)+" failed reads, "+str(bridge.reconnects)+" reconnects")
+        if (engine.dropped>0):
+            print("Display: "+str(engine.dropped)+" rows dropped")
+            messagebox.showwarning("Logging",str(engine.dropped)+" samples were dropped because the display fell behind "
+                                   +"the acquisition engine. They are missing from the log; try a longer sample period.")
     
 def About():
     Pmw.aboutversion(str(Version))
@@ -441,9 +459,46 @@ def shutDown():
     StopLog()
     if (lfOpen):
         logFile.close()   
+    engine.stop()
+    engine.join(2)
     root.destroy()
 
     
+#logPolicy: flush and fsync settings for the log writer from the Logging Setup dialog
+def logPolicy():
+    try:
+        rows=int(FlushRows.get())
+    except ValueError:
+        rows=100
+    try:
+        secs=float(FlushSecs.get())
+    except ValueError:
+        secs=1.0
+    try:
+        fsync=float(FsyncSecs.get())
+    except ValueError:
+        fsync=0.0
+    return rows,secs,fsync
+
+#logRotation: when to start a new log segment, from the Logging Setup dialog
+def logRotation():
+    try:
+        maxBytes=int(float(SegmentMB.get())*1000000)
+    except ValueError:
+        maxBytes=0
+    try:
+        maxSecs=float(SegmentMins.get())*60
+    except ValueError:
+        maxSecs=0
+    return Rotation(maxBytes,maxSecs,SegmentAt.get())
+
+#keyframeSecs: seconds between full rows of a change-driven log, from the Logging Setup dialog
+def keyframeSecs():
+    try:
+        return float(KeyframeSecs.get())
+    except ValueError:
+        return KEYFRAME_SECS
+
 #Configure: Dialog box to get sampling parameters that holds focus until closed.    
 def Configure():
     global icon
@@ -454,33 +509,104 @@ def Configure():
         cBox.wm_iconphoto(False, icon)
         cBox.focus_set()
 
-        sP=Label(cBox,text='Sample Period in Seconds (Minimum is '+str(round(SampleTmin,4))+'):', padx=2, pady=2)
+        sP=Label(cBox,text='Sample Period in Seconds (Measured Minimum is', padx=2, pady=2)
         sP.grid(row=0,column=0,sticky="e")
+        sPmin=Label(cBox,textvariable=sTmin, padx=0, pady=2)
+        sPmin.grid(row=0,column=1,sticky="w")
         sPval=Entry(cBox,width=8,textvariable=SamplePeriod)
-        sPval.grid(row=0,column=1,sticky="w")
+        sPval.grid(row=0,column=2,sticky="w")
         
-        sC=Label(cBox,text="Sample Count:", padx=2, pady=2)
-        sC.grid(row=1,column=0,sticky="e")
+        sC=Label(cBox,text="Sample Count (0 = Continuous):", padx=2, pady=2)
+        sC.grid(row=1,column=0,columnspan=2,sticky="e")
         sCval=Entry(cBox,width=8,textvariable=SampleCount)
-        sCval.grid(row=1,column=1,sticky="w")
+        sCval.grid(row=1,column=2,sticky="w")
+
+        fR=Label(cBox,text="Write Log to Disk Every N Rows:", padx=2, pady=2)
+        fR.grid(row=2,column=0,columnspan=2,sticky="e")
+        fRval=Entry(cBox,width=8,textvariable=FlushRows)
+        fRval.grid(row=2,column=2,sticky="w")
+
+        fS=Label(cBox,text="...or Every N Seconds:", padx=2, pady=2)
+        fS.grid(row=3,column=0,columnspan=2,sticky="e")
+        fSval=Entry(cBox,width=8,textvariable=FlushSecs)
+        fSval.grid(row=3,column=2,sticky="w")
+
+        fY=Label(cBox,text="Force Log onto Disk (fsync) Every N Seconds (0 = Never):", padx=2, pady=2)
+        fY.grid(row=4,column=0,columnspan=2,sticky="e")
+        fYval=Entry(cBox,width=8,textvariable=FsyncSecs)
+        fYval.grid(row=4,column=2,sticky="w")
+
+        gM=Label(cBox,text="Start a New Log Segment Every N MB (0 = Off):", padx=2, pady=2)
+        gM.grid(row=5,column=0,columnspan=2,sticky="e")
+        gMval=Entry(cBox,width=8,textvariable=SegmentMB)
+        gMval.grid(row=5,column=2,sticky="w")
+
+        gT=Label(cBox,text="...or Every N Minutes (0 = Off):", padx=2, pady=2)
+        gT.grid(row=6,column=0,columnspan=2,sticky="e")
+        gTval=Entry(cBox,width=8,textvariable=SegmentMins)
+        gTval.grid(row=6,column=2,sticky="w")
+
+        gA=Label(cBox,text="...or at Every Clock:", padx=2, pady=2)
+        gA.grid(row=7,column=0,columnspan=2,sticky="e")
+        gAval=OptionMenu(cBox,SegmentAt,'off','hour','day')
+        gAval.grid(row=7,column=2,sticky="w")
+
+        cC=Label(cBox,text="Compress Log With:", padx=2, pady=2)
+        cC.grid(row=8,column=0,columnspan=2,sticky="e")
+        cCval=OptionMenu(cBox,LogCodec,*CODECS.keys())
+        cCval.grid(row=8,column=2,sticky="w")
+
+        dF=Label(cBox,text="Screen Updates per Second:", padx=2, pady=2)
+        dF.grid(row=9,column=0,columnspan=2,sticky="e")
+        dFval=Entry(cBox,width=8,textvariable=DisplayFPS)
+        dFval.grid(row=9,column=2,sticky="w")
+
+        rL=Label(cBox,text="Log Layout for Mixed Sample Rates:", padx=2, pady=2)
+        rL.grid(row=10,column=0,columnspan=2,sticky="e")
+        rLval=OptionMenu(cBox,LogLayout,*LAYOUTS)
+        rLval.grid(row=10,column=2,sticky="w")
+
+        lC=Label(cBox,text="Log Only Values that Change by More than their Deadband:", padx=2, pady=2)
+        lC.grid(row=11,column=0,columnspan=2,sticky="e")
+        lCval=OptionMenu(cBox,LogChanges,'off','on')
+        lCval.grid(row=11,column=2,sticky="w")
+
+        kF=Label(cBox,text="...with a Full Row Every N Seconds (0 = Only at the Start):", padx=2, pady=2)
+        kF.grid(row=12,column=0,columnspan=2,sticky="e")
+        kFval=Entry(cBox,width=8,textvariable=KeyframeSecs)
+        kFval.grid(row=12,column=2,sticky="w")
+
+        tS=Label(cBox,text="CSV Timestamps (local to the second, UTC or epoch to the microsecond):", padx=2, pady=2)
+        tS.grid(row=13,column=0,columnspan=2,sticky="e")
+        tSval=OptionMenu(cBox,LogStamps,*STAMP_COLUMNS.keys())
+        tSval.grid(row=13,column=2,sticky="w")
+
+        rT=Label(cBox,text="Log the Read Time of Each Plate:", padx=2, pady=2)
+        rT.grid(row=14,column=0,columnspan=2,sticky="e")
+        rTval=OptionMenu(cBox,SkewColumns,'off','on')
+        rTval.grid(row=14,column=2,sticky="w")
 
         sD1=Label(cBox,text="Log Duration in seconds = ", pady=20)
-        sD1.grid(row=2,column=0,sticky="e")
+        sD1.grid(row=15,column=0,sticky="e")
         sD2=Label(cBox,textvariable=sDval, pady=20)
-        sD2.grid(row=2,column=1,sticky="w")
+        sD2.grid(row=15,column=1,columnspan=2,sticky="w")
     
         sB=Button(cBox, text='Close', command=cBox.destroy)
-        sB.grid(row=3, columnspan=2, pady=4)
+        sB.grid(row=16, columnspan=3, pady=4)
         
         cBox.grab_set()
         center(cBox)
         root.wait_window(cBox)
 
-#doUpdates: a recurring routine to update the value of the displayed test duration value
+#doUpdates: a recurring routine to update the displayed test duration and measured minimum sample period
 def doUpdates():
     root.after(500,doUpdates)   
+    sTmin.set(str(SampleTmin)+'):')
     try:
-        sDval.set(str(round(float(SamplePeriod.get())*float(SampleCount.get()),2)))
+        if (int(SampleCount.get())<=0):
+            sDval.set('Continuous')
+        else:
+            sDval.set(str(round(float(SamplePeriod.get())*float(SampleCount.get()),2)))
     except ValueError:
         sDval.set('0')    
 
@@ -557,140 +683,212 @@ def ViewLog():
     root.wait_window(vBox) 
   
     
-def task():
-    global logFile, lfOpen, Logging, fName, SampleC, SampleT, logHeader
-    global theta, dnum
+#pageRaised: only the dashboard on the page being shown draws its traces; the others keep collecting data
+def pageRaised(pageName):
+    for name in pageDash:
+        if (name!=pageName):
+            pageDash[name].setShown(False)
+    if (pageName in pageDash):
+        pageDash[pageName].setShown(True)
+
+#checkTopology: waits for the background probe of a cached plate stack and warns if the hardware has changed
+def checkTopology():
+    if (not topologyCheck.done.is_set()):
+        root.after(500,checkTopology)
+        return
+    if (topologyCheck.mismatch()):
+        messagebox.showwarning('Plate Stack',
+                               'The plates on the BRIDGEplate ('+describeStack(topologyCheck.found)+') do not match the cached stack '
+                               +'the logger started with ('+describeStack(topologyCheck.stack)+'). Restart the logger to use the plates now present.')
+
+#replan: called whenever a channel selection changes so the next task() pass rebuilds the acquisition plan.
+#While logging the plan is left alone, since the log's columns can't change; any change waits for StopLog.
+def replan():
+    global planDirty
+    planDirty=True
+
+#setRate: apply a dashboard's Sample Every N Periods setting to its channels
+def setRate(var,chans):
     try:
-        SampleT=float(SamplePeriod.get())
-        if (SampleT<SampleTmin):
-            SampleT=SampleTmin
+        every=max(1,int(var.get()))
     except ValueError:
-        SampleT=SampleTmin
-    root.after(int(SampleT*1000),task)   
-    logString=''
-    dTypes=''
-    #j=0
-    # a=setCMD("Mp.toggleLED()")
-    for i in range (0,8): #for DAQC2plates 0 through 7
-        a2dvals=range(8)
-        dinvals=range(8)
+        return          #keep the previous rate while the entry is being edited
+    for ch in chans:
+        ch.model.every=every
+    replan()
+
+#lockable: register a control that changes what is sampled or logged so it is disabled while logging
+def lockable(widget):
+    lockedControls.append(widget)
+    if (Logging):
+        widget.configure(state=DISABLED)
+    return widget
+
+#lockControls: disable the registered controls when logging starts and enable them again when it stops
+def lockControls(locked):
+    for widget in lockedControls:
+        widget.configure(state=DISABLED if locked else NORMAL)
+
+#rateControl: the Sample Every N Periods entry in the button row of a dashboard
+def rateControl(frame,var,column):
+    Label(frame,text='Sample Every',bg='black',fg='white').grid(row=0,column=column,padx=4,pady=5)
+    lockable(Spinbox(frame,from_=1,to=10000,width=6,textvariable=var)).grid(row=0,column=column+1,pady=5)
+    Label(frame,text='Periods',bg='black',fg='white').grid(row=0,column=column+2,padx=4,pady=5)
+
+#setDeadband: apply a dashboard's Deadband setting to its channels
+def setDeadband(var,chans):
+    try:
+        band=abs(float(var.get()))
+    except ValueError:
+        return          #keep the previous deadband while the entry is being edited
+    for ch in chans:
+        ch.model.deadband=band
+
+#deadbandControl: the Deadband entry in the button row of a dashboard; used when only changes are logged
+def deadbandControl(frame,var,column):
+    Label(frame,text='Deadband',bg='black',fg='white').grid(row=0,column=column,padx=4,pady=5)
+    lockable(Entry(frame,width=6,textvariable=var)).grid(row=0,column=column+1,pady=5)
+
+#rateDashes: the dashboards whose Sample Every N Periods and Deadband are kept in a setup file, in file order
+def rateDashes():
+    dashes=[]
+    for i in range(8):
+        if (DAQCpresent[i]==1):
+            dashes.append(DAQCo[i])
+    for i in range(8):
         if (DAQC2present[i]==1):
-            #Retrieve and plot  values
-            a2dvals=DAQC2o[i].a2dupdate() 
-            dinvals=DAQC2o[i].dinupdate()          
-            #Convert data to strings for log
-            for k in range(8):
-                if (a2dvals[k] != ''):
-                    logString=logString+str(a2dvals[k])+','
-                    #aChannelCount += 1
-                    dTypes = dTypes+'a,'
-            for k in range(8):
-                if (dinvals[k] != ''):
-                    logString=logString+str(dinvals[k])+','
-                    #dChannelCount += 1
-                    dTypes = dTypes+'d,'
+            dashes.append(DAQC2o[i])
+    for i in range(8):
+        if (THERMOpresent[i]==1):
+            dashes.append(THERMOo[i])
+    for i in range(8):
+        if (CURRENTpresent[i]==1):
+            dashes.append(CURRENTo[i])
+    for i in range(8):
+        if (ADCpresent[i]==1):
+            dashes+=[ADCo1[i],ADCo2[i]]
+    return dashes
 
+#buildPlan: collect the selected channels in log column order and hand their commands to the acquisition engine
+def buildPlan():
+    global planChans, planId, planDirty, planSkew
+    chans=[]
+    for i in range (0,8): #for DAQC2plates 0 through 7
+        if (DAQC2present[i]==1):
+            chans+=DAQC2o[i].a2dSelected()+DAQC2o[i].dinSelected()
     for i in range (0,8): #for DAQCplates 0 through 7
-        a2dvals=range(8)
-        dinvals=range(8)
         if (DAQCpresent[i]==1):
-            #Retrieve and plot  values
-            a2dvals=DAQCo[i].a2dupdate() 
-            dinvals=DAQCo[i].dinupdate()          
-            #Convert data to strings for log
-            for k in range(8):
-                if (a2dvals[k] != ''):
-                    logString=logString+str(a2dvals[k])+','
-                    #aChannelCount += 1
-                    dTypes = dTypes+'a,'
-            for k in range(8):
-                if (dinvals[k] != ''):
-                    logString=logString+str(dinvals[k])+','
-                    #dChannelCount += 1
-                    dTypes = dTypes+'d,'
-
+            chans+=DAQCo[i].a2dSelected()+DAQCo[i].dinSelected()
     for i in range (0,8): #for THERMOplates 0 through 7
-        tvals=range(12)
         if (THERMOpresent[i]==1):
-            #Retrieve and plot  values
-            tvals=THERMOo[i].Tupdate() 
-         
-            #Convert data to strings for log
-            for k in range(12):
-                if (tvals[k] != ''):
-                    logString=logString+str(tvals[k])+','
-                    #tChannelCount += 1
-                    dTypes = dTypes+'t,'
-
+            chans+=THERMOo[i].TSelected()
     for i in range (0,8): #for CURRENTplates 0 through 7
-        ivals=range(8)
         if (CURRENTpresent[i]==1):
-            #Retrieve and plot  values
-            ivals=CURRENTo[i].Iupdate() 
-         
-            #Convert data to strings for log
-            for k in range(12):
-                if (ivals[k] != ''):
-                    logString=logString+str(ivals[k])+','
-                    #tChannelCount += 1
-                    dTypes = dTypes+'i,'
-
+            chans+=CURRENTo[i].ISelected()
     for i in range (0,8): #for ADCplates 0 through 7
-        a2dvals=range(12)
-        dinvals=range(4)
-        ivals=range(4)
         if (ADCpresent[i]==1):
-            #Retrieve and plot  values
-            a2dvals=ADCo1[i].a2dupdate() 
-            ivals=ADCo2[i].Iupdate()
-            dinvals=ADCo2[i].dinupdate()          
-            #Convert data to strings for log
-            for k in range(12):
-                if (a2dvals[k] != ''):
-                    logString=logString+str(a2dvals[k])+','
-                    #aChannelCount += 1
-                    dTypes = dTypes+'a,'
-            for k in range(4):
-                if (dinvals[k] != ''):
-                    logString=logString+str(dinvals[k])+','
-                    #dChannelCount += 1
-                    dTypes = dTypes+'d,'
-            for k in range(4):
-                if (ivals[k] != ''):
-                    logString=logString+str(ivals[k])+','
-                    #dChannelCount += 1
-                    dTypes = dTypes+'i,'         
-                    
+            chans+=ADCo1[i].a2dSelected()+ADCo2[i].dinSelected()+ADCo2[i].ISelected()
     for i in range (0,8): #for DIGIplates 0 through 7
-        dvals=range(8)
         if (DIGIpresent[i]==1):
-            #Retrieve and plot  values
-            dvals=DIGIo[i].dinupdate()
-            #Convert data to strings for log
-            for k in range(8):
-                if (dvals[k] != ''):
-                    logString=logString+str(dvals[k])+','
-                    #tChannelCount += 1
-                    dTypes = dTypes+'d,'
-
-    dtypes = dTypes[:-1]
-    logString = logString[:-1]    
-    logString = datetime.datetime.today().strftime('%Y-%m-%d-%H:%M:%S')+','+logString
-    if (Logging and lfOpen):
-        logFile.write(logString)
-        logFile.write('\n')            
-    if (Logging):
-        SampleC -= 1
-        root.wm_title("Pi-Plate Data Logger - LOGGING - "+str(SampleC)+" Samples and "+str(round(SampleT*SampleC,2))+" Seconds Remaining")
-        if (SampleC==0):
-            StopLog()
-            messagebox.showinfo("Logging","Logging Complete")     
+            chans+=DIGIo[i].dinSelected()
+    planChans=chans
+    planSkew=(SkewColumns.get()=='on')
+    planId=engine.setPlan([(ch.readCmd(),ch.model.conv,ch.bulkRead()) for ch in chans],[ch.model.every for ch in chans],planSkew)
+    planDirty=False
+
+#task: drains the rows produced by the acquisition engine, plots them and writes them to the log.
+#No serial traffic happens here so a busy GUI can no longer delay sampling.
+def task():
+    global logFile, lfOpen, Logging, fName, SampleC, SampleT, SampleTmin, logHeader, Continuous, titleDirty
+    root.after(DRAIN_MS,task)
+    SampleTmin=engine.minPeriod
+    try:
+        SampleT=float(SamplePeriod.get())
+        if (SampleT<SampleTmin):
+            SampleT=SampleTmin
+    except ValueError:
+        SampleT=SampleTmin
+    engine.setPeriod(SampleT)
+    if (planDirty and not Logging):
+        buildPlan()
+    if (Logging and lfOpen and logFile.error):
+        StopLog()
+        messagebox.showerror("Logging","Writing the log file failed: "+str(logFile.error))
+    for rowId,stamp,vals in engine.drain():
+        if (rowId!=planId):
+            continue        #row was sampled with a channel selection that no longer applies
+        if (vals!=None):            #None is a sample lost to an overrun; the log writer keeps its slot
+            for k in range(len(planChans)):     #any read time columns follow the channels
+                if (vals[k] is not NOT_DUE):
+                    planChans[k].post(vals[k])
+        if (Logging and lfOpen):
+            logFile.write(stamp,vals)
+        if (Logging):
+            if (Continuous):
+                SampleC += 1
+            else:
+                SampleC -= 1
+            titleDirty=True
+            if (SampleC==0 and not Continuous):
+                StopLog()
+                messagebox.showinfo("Logging","Logging Complete")     
+
+#logTitle: the title bar text while logging
+def logTitle():
+    skipped=engine.stats()[2]
+    behind=logFile.depth() if lfOpen else 0
+    if (Continuous):
+        status=" - CONTINUOUS - "+str(SampleC)+" Samples"
+        if (lfOpen and len(logFile.segments)>1):
+            status=status+" - Segment "+str(len(logFile.segments))
+    else:
+        status=" - "+str(SampleC)+" Samples and "+str(round(SampleT*SampleC,2))+" Seconds Remaining"
+    return ("Pi-Plate Data Logger - LOGGING"+status
+            +(" - BRIDGEplate LOST, Reconnecting" if bridge.lost else "")
+            +(" - "+str(skipped)+" Skipped" if skipped>0 else "")
+            +(" - "+str(bridge.failed)+" Failed Reads" if bridge.failed>0 else "")
+            +(" - "+str(engine.dropped)+" Dropped" if engine.dropped>0 else "")
+            +(" - Disk "+str(behind)+" Rows Behind" if behind>=LOG_BEHIND else ""))
+
+#render: redraws the screen at most DisplayFPS times a second, however fast samples arrive.
+#Every channel with new samples gets one label update and one trace update per frame.
+def render():
+    global dirtyChans, titleDirty
+    try:
+        fps=min(60.0,max(1.0,float(DisplayFPS.get())))
+    except ValueError:
+        fps=DISPLAY_FPS
+    root.after(int(1000/fps),render)
+    chans=dirtyChans
+    dirtyChans=[]
+    for ch in chans:
+        ch.render()
+    if (Logging and titleDirty):
+        root.wm_title(logTitle())       #built once per frame, not once per sample
+    titleDirty=False
             
 class daqcDASH:
     def __init__(self,frame,addr,type):
         self.a2d=range(8)
         self.din=range(8)    
         
+        self.addr=addr
+        self.root=frame
+        self.type=type
+        
+        self.a2d=list(range(8))
+        self.din=list(range(8))
+
+        for i in range(0,8):
+            self.a2d[i]=ADC(self.root,self.addr,i,self.type)
+            self.din[i]=DIN(self.root,self.addr,i,self.type)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.every=StringVar(self.root,'1')     #Sample Every N Periods of this dashboard's channels
+        self.every.trace_add('write',lambda *args: setRate(self.every,self.a2d+self.din))
+        self.deadband=StringVar(self.root,'0')     #Deadband of this dashboard's channels when only changes are logged
+        self.deadband.trace_add('write',lambda *args: setDeadband(self.deadband,self.a2d+self.din))
+
+    def build(self):
         def deSelect():
             for i in range(0,8):
                 self.a2d[i].deSelect()
@@ -701,10 +899,6 @@ class daqcDASH:
                 self.a2d[i].Select()
                 self.din[i].Select()
             
-        self.addr=addr
-        self.root=frame
-        self.type=type
-        
         BG='#888FFF888'
         off=0
         self.mFrame=Frame(self.root,bg='black',bd=0,relief="ridge")
@@ -713,25 +907,31 @@ class daqcDASH:
         self.button1.grid(row=0, column=0, padx=4,pady=5)
         self.button2=Button(self.mFrame, text='Select All', command=selectAll)  
         self.button2.grid(row=0, column=1, padx=4,pady=5)
-        
-        self.a2d=list(range(8))
-        self.din=list(range(8))
-
+        rateControl(self.mFrame,self.every,2)
+        deadbandControl(self.mFrame,self.deadband,5)
+        for ch in self.a2d+self.din:
+            ch.build()
+        self.built=True
+
+    def setShown(self,shown):
+        if (shown and not self.built):
+            self.build()
+        for ch in self.a2d+self.din:
+            ch.setShown(shown)
+
+    def a2dSelected(self):
+        chans=[]
         for i in range(0,8):
-            self.a2d[i]=ADC(self.root,self.addr,i,self.type)
-            self.din[i]=DIN(self.root,self.addr,i,self.type)      
-    
-    def a2dupdate(self):
-        vals=['','','','','','','','']
-        for i in range(0,8):          
-            vals[i]=self.a2d[i].update()
-        return vals
+            if (self.a2d[i].getState()==1):
+                chans.append(self.a2d[i])
+        return chans
 
-    def dinupdate(self):
-        vals=['','','','','','','','']
-        for i in range(0,8):          
-            vals[i]=self.din[i].update()
-        return vals   
+    def dinSelected(self):
+        chans=[]
+        for i in range(0,8):
+            if (self.din[i].getState()==1):
+                chans.append(self.din[i])
+        return chans   
 
     def a2dDescriptors(self):
         vals=['','','','','','','','']
@@ -797,6 +997,26 @@ class thermoDASH:
     def __init__(self,frame,addr,type):
         self.T=list(range(12))
         self.scale=StringVar()
+        self.addr=addr
+        self.root=frame
+        self.type=type
+        self.v = IntVar()
+        self.scale=StringVar(self.root,'c')
+        self.scale.set('c')
+
+        v=IntVar()       
+
+        self.T=list(range(12))
+
+        for i in range(0,12):
+            self.T[i]=TEMP(self.root,self.addr,i,self.type)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.every=StringVar(self.root,'1')     #Sample Every N Periods of this dashboard's channels
+        self.every.trace_add('write',lambda *args: setRate(self.every,self.T))
+        self.deadband=StringVar(self.root,'0')     #Deadband of this dashboard's channels when only changes are logged
+        self.deadband.trace_add('write',lambda *args: setDeadband(self.deadband,self.T))
+
+    def build(self):
         def deSelect():
             for i in range(0,12):
                 self.T[i].deSelect()
@@ -809,15 +1029,6 @@ class thermoDASH:
         def setScale(val):
             self.scale.set(val)
         
-        self.addr=addr
-        self.root=frame
-        self.type=type
-        self.v = IntVar()
-        self.scale=StringVar(self.root,'c')
-        self.scale.set('c')
-
-        v=IntVar()       
-
         BG='#888FFF888'
         off=0
         self.mFrame=Frame(self.root,bg='black',bd=0,relief="ridge")
@@ -827,27 +1038,35 @@ class thermoDASH:
         self.button2=Button(self.mFrame, text='Select All', command=selectAll)  
         self.button2.grid(row=0, column=1, padx=4,pady=5)
         #self.s1=Radiobutton(self.mFrame,text=u'\u00b0'+'C',variable=v, value=1 ,command=setScale('C'))
-        self.s1=Radiobutton(self.mFrame,text=u'\u00b0'+'C',variable=self.scale, value='c')
+        self.s1=lockable(Radiobutton(self.mFrame,text=u'\u00b0'+'C',variable=self.scale, value='c',command=replan))
         self.s1.grid(row=0, column=2, padx=4,pady=5)
-        self.s2=Radiobutton(self.mFrame,text=u'\u00b0'+'F',variable=self.scale, value='f')
+        self.s2=lockable(Radiobutton(self.mFrame,text=u'\u00b0'+'F',variable=self.scale, value='f',command=replan))
         self.s2.grid(row=0, column=3, padx=4,pady=5)        
-        self.s3=Radiobutton(self.mFrame,text=u'\u00b0'+'K',variable=self.scale, value='k')
+        self.s3=lockable(Radiobutton(self.mFrame,text=u'\u00b0'+'K',variable=self.scale, value='k',command=replan))
         self.s3.grid(row=0, column=4, padx=4,pady=5) 
+        rateControl(self.mFrame,self.every,5)
+        deadbandControl(self.mFrame,self.deadband,8)
         self.s1.select()
         self.s2.deselect()
         self.s3.deselect()
-      
-        self.T=list(range(12))
-
-        for i in range(0,12):
-            self.T[i]=TEMP(self.root,self.addr,i,self.type)
-    
-    def Tupdate(self):
-        vals=['','','','','','','','','','','','']
+        for ch in self.T:
+            ch.build()
+        self.built=True
+
+    def setShown(self,shown):
+        if (shown and not self.built):
+            self.build()
+        for ch in self.T:
+            ch.setShown(shown)
+
+    def TSelected(self):
+        chans=[]
         lscale=self.scale.get()
-        for i in range(0,12):          
-            vals[i]=self.T[i].update(lscale)
-        return vals
+        for i in range(0,12):
+            if (self.T[i].getState()==1):
+                self.T[i].scale=lscale
+                chans.append(self.T[i])
+        return chans
 
     def TDescriptors(self):
         vals=['','','','','','','','','','','','']
@@ -884,6 +1103,20 @@ class currentDASH:
     def __init__(self,frame,addr,type):
         self.I=list(range(8))
         self.scale=StringVar()
+        self.addr=addr
+        self.root=frame
+        self.type=type        
+        self.I=list(range(8))
+
+        for i in range(0,8):
+            self.I[i]=AMPS(self.root,self.addr,i,type)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.every=StringVar(self.root,'1')     #Sample Every N Periods of this dashboard's channels
+        self.every.trace_add('write',lambda *args: setRate(self.every,self.I))
+        self.deadband=StringVar(self.root,'0')     #Deadband of this dashboard's channels when only changes are logged
+        self.deadband.trace_add('write',lambda *args: setDeadband(self.deadband,self.I))
+
+    def build(self):
         def deSelect():
             for i in range(0,8):
                 self.I[i].deSelect()
@@ -895,9 +1128,6 @@ class currentDASH:
         def setScale(val):
             self.scale=val
         
-        self.addr=addr
-        self.root=frame
-        self.type=type        
         BG='#888FFF888'
         off=0
         self.mFrame=Frame(self.root,bg='Black',bd=0,relief="ridge")
@@ -905,18 +1135,25 @@ class currentDASH:
         self.button1=Button(self.mFrame, text='Clear All', command=deSelect)
         self.button1.grid(row=0, column=0, padx=4,pady=5)
         self.button2=Button(self.mFrame, text='Select All', command=selectAll)  
-        self.button2.grid(row=0, column=1, padx=4,pady=5)       
-       
-        self.I=list(range(8))
-
+        self.button2.grid(row=0, column=1, padx=4,pady=5)
+        rateControl(self.mFrame,self.every,2)
+        deadbandControl(self.mFrame,self.deadband,5)
+        for ch in self.I:
+            ch.build()
+        self.built=True
+
+    def setShown(self,shown):
+        if (shown and not self.built):
+            self.build()
+        for ch in self.I:
+            ch.setShown(shown)
+
+    def ISelected(self):
+        chans=[]
         for i in range(0,8):
-            self.I[i]=AMPS(self.root,self.addr,i,type)
-    
-    def Iupdate(self):
-        vals=['','','','','','','','','','','','']
-        for i in range(0,8):          
-            vals[i]=self.I[i].update()
-        return vals
+            if (self.I[i].getState()==1):
+                chans.append(self.I[i])
+        return chans
 
     def IDescriptors(self):
         vals=['','','','','','','','','','','','']
@@ -952,6 +1189,21 @@ class adc1DASH:
     def __init__(self,frame,addr,type):
         self.a2d=range(12)
         
+        self.addr=addr
+        self.root=frame
+        self.type=type
+        
+        self.a2d=list(range(12))
+
+        for i in range(0,12):
+            self.a2d[i]=ADC(self.root,self.addr,i,self.type)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.every=StringVar(self.root,'1')     #Sample Every N Periods of this dashboard's channels
+        self.every.trace_add('write',lambda *args: setRate(self.every,self.a2d))
+        self.deadband=StringVar(self.root,'0')     #Deadband of this dashboard's channels when only changes are logged
+        self.deadband.trace_add('write',lambda *args: setDeadband(self.deadband,self.a2d))
+
+    def build(self):
         def deSelect():
             for i in range(0,12):
                 self.a2d[i].deSelect()
@@ -960,10 +1212,6 @@ class adc1DASH:
             for i in range(0,12):        
                 self.a2d[i].Select()
             
-        self.addr=addr
-        self.root=frame
-        self.type=type
-        
         BG='#888FFF888'
         off=0
         self.mFrame=Frame(self.root,bg='black',bd=0,relief="ridge")
@@ -972,17 +1220,24 @@ class adc1DASH:
         self.button1.grid(row=0, column=0, padx=4,pady=5)
         self.button2=Button(self.mFrame, text='Select All', command=selectAll)  
         self.button2.grid(row=0, column=1, padx=4,pady=5)
-        
-        self.a2d=list(range(12))
-
+        rateControl(self.mFrame,self.every,2)
+        deadbandControl(self.mFrame,self.deadband,5)
+        for ch in self.a2d:
+            ch.build()
+        self.built=True
+
+    def setShown(self,shown):
+        if (shown and not self.built):
+            self.build()
+        for ch in self.a2d:
+            ch.setShown(shown)
+
+    def a2dSelected(self):
+        chans=[]
         for i in range(0,12):
-            self.a2d[i]=ADC(self.root,self.addr,i,self.type)    
-    
-    def a2dupdate(self):
-        vals=['','','','','','','','','','','','']
-        for i in range(0,12):          
-            vals[i]=self.a2d[i].update()
-        return vals
+            if (self.a2d[i].getState()==1):
+                chans.append(self.a2d[i])
+        return chans
 
     def a2dDescriptors(self):
         vals=['','','','','','','','','','','','']
@@ -1020,6 +1275,23 @@ class adc2DASH:
         self.I=range(4)
         self.din=range(4)    
         
+        self.addr=addr
+        self.root=frame
+        self.type=type
+        
+        self.I=list(range(4))
+        self.din=list(range(4))
+
+        for i in range(0,4):
+            self.I[i]=AMPS(self.root,self.addr,i,self.type)
+            self.din[i]=DIN(self.root,self.addr,i,self.type)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.every=StringVar(self.root,'1')     #Sample Every N Periods of this dashboard's channels
+        self.every.trace_add('write',lambda *args: setRate(self.every,self.I+self.din))
+        self.deadband=StringVar(self.root,'0')     #Deadband of this dashboard's channels when only changes are logged
+        self.deadband.trace_add('write',lambda *args: setDeadband(self.deadband,self.I+self.din))
+
+    def build(self):
         def deSelect():
             for i in range(0,4):
                 self.I[i].deSelect()
@@ -1030,10 +1302,6 @@ class adc2DASH:
                 self.I[i].Select()
                 self.din[i].Select()
             
-        self.addr=addr
-        self.root=frame
-        self.type=type
-        
         BG='#888FFF888'
         off=0
         self.mFrame=Frame(self.root,bg='black',bd=0,relief="ridge")
@@ -1042,19 +1310,24 @@ class adc2DASH:
         self.button1.grid(row=0, column=0, padx=4,pady=5)
         self.button2=Button(self.mFrame, text='Select All', command=selectAll)  
         self.button2.grid(row=0, column=1, padx=4,pady=5)
-        
-        self.I=list(range(4))
-        self.din=list(range(4))
-
+        rateControl(self.mFrame,self.every,2)
+        deadbandControl(self.mFrame,self.deadband,5)
+        for ch in self.I+self.din:
+            ch.build()
+        self.built=True
+
+    def setShown(self,shown):
+        if (shown and not self.built):
+            self.build()
+        for ch in self.I+self.din:
+            ch.setShown(shown)
+
+    def ISelected(self):
+        chans=[]
         for i in range(0,4):
-            self.I[i]=AMPS(self.root,self.addr,i,self.type)
-            self.din[i]=DIN(self.root,self.addr,i,self.type)      
-    
-    def Iupdate(self):
-        vals=['','','','']
-        for i in range(0,4):          
-            vals[i]=self.I[i].update()
-        return vals
+            if (self.I[i].getState()==1):
+                chans.append(self.I[i])
+        return chans
 
     def IDescriptors(self):
         vals=['','','','']
@@ -1087,11 +1360,12 @@ class adc2DASH:
             self.I[i].setState(self.vals[i])
         return              
     
-    def dinupdate(self):
-        vals=['','','','']
-        for i in range(0,4):          
-            vals[i]=self.din[i].update()
-        return vals   
+    def dinSelected(self):
+        chans=[]
+        for i in range(0,4):
+            if (self.din[i].getState()==1):
+                chans.append(self.din[i])
+        return chans   
         
     def dinDescriptors(self):
         vals=['','','','']
@@ -1127,6 +1401,21 @@ class digiDASH:
     def __init__(self,frame,addr,dtype):
         self.din=range(8)    
         
+        self.addr=addr
+        self.root=frame
+        self.type=dtype
+        
+        self.din=list(range(8))
+
+        for i in range(0,8):
+            self.din[i]=DIN(self.root,self.addr,i+1,self.type)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.every=StringVar(self.root,'1')     #Sample Every N Periods of this dashboard's channels
+        self.every.trace_add('write',lambda *args: setRate(self.every,self.din))
+        self.deadband=StringVar(self.root,'0')     #Deadband of this dashboard's channels when only changes are logged
+        self.deadband.trace_add('write',lambda *args: setDeadband(self.deadband,self.din))
+
+    def build(self):
         def deSelect():
             for i in range(0,8):
                 self.din[i].deSelect()
@@ -1135,10 +1424,6 @@ class digiDASH:
             for i in range(0,8):        
                 self.din[i].Select()
             
-        self.addr=addr
-        self.root=frame
-        self.type=dtype
-        
         BG='#888FFF888'
         off=0
         self.mFrame=Frame(self.root,bg='black',bd=0,relief="ridge")
@@ -1147,17 +1432,24 @@ class digiDASH:
         self.button1.grid(row=0, column=0, padx=4,pady=5)
         self.button2=Button(self.mFrame, text='Select All', command=selectAll)  
         self.button2.grid(row=0, column=1, padx=4,pady=5)
-        
-        self.din=list(range(8))
-
+        rateControl(self.mFrame,self.every,2)
+        deadbandControl(self.mFrame,self.deadband,5)
+        for ch in self.din:
+            ch.build()
+        self.built=True
+
+    def setShown(self,shown):
+        if (shown and not self.built):
+            self.build()
+        for ch in self.din:
+            ch.setShown(shown)
+
+    def dinSelected(self):
+        chans=[]
         for i in range(0,8):
-            self.din[i]=DIN(self.root,self.addr,i+1,self.type)      
-
-    def dinupdate(self):
-        vals=['','','','','','','','']
-        for i in range(0,8):          
-            vals[i]=self.din[i].update()
-        return vals   
+            if (self.din[i].getState()==1):
+                chans.append(self.din[i])
+        return chans   
         
     def dinDescriptors(self):
         vals=['','','','','','','','']
@@ -1195,113 +1487,144 @@ class ADC:
         self.root=root
         self.chan=channel
         self.type=atype
-        self.var=IntVar()   #This is the select button for each channel
-        self.var.set(0)
-        self.val=DoubleVar()
+        self.CWidth=int(.84*W+8)
+        self.model=Channel('',float,self.CWidth)
         self.color=PALETTE[channel%8]
+        if (self.type==3):
+            if (self.chan<8):
+                lString="SE Channel "
+            else:
+                lString="DE Channel "
+        else:
+            lString="A Channel "
+        if (self.type==3 and self.chan>7):         
+            self.model.label=lString+str(self.chan-8)+":"
+        else:
+            self.model.label=lString+str(self.chan)+":"
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.shown=False
+
+    def build(self):
+        self.var=IntVar()   #This is the select button for each channel
+        self.var.set(int(self.model.selected))
         mheight=SLICE
         if(self.type==3):
-            self.val.set(float(CMD("ADC.getADC("+str(self.addr)+','+str(self.chan)+')')))
             mheight=SLICE+13
-        elif (self.type==2):
-            self.val.set(float(CMD("DAQC2.getADC("+str(self.addr)+','+str(self.chan)+')')))
-        else:
-            self.val.set(float(CMD("DAQC.getADC("+str(self.addr)+','+str(self.chan)+')')))
         self.valstring=StringVar()
         #self.valstring.set(str(self.val.get()))
         self.valstring.set('off')        
         off=H-2-17*SLICE+self.chan*mheight
         BG='#000000000'
-        #self.CWidth=int(.85*W+14)
-        self.CWidth=int(.84*W+8)
         self.a2df=Frame(self.root,bg=BG,bd=0,relief="ridge")
         self.a2df.place(x=0,y=off,width=W,height=mheight)
         self.a2dc=Checkbutton(self.a2df,fg="Black",bg=BG,variable=self.var,onvalue = 1, offvalue = 0,command=self.cb)
         self.a2dc.grid(row=0,column=0,sticky="w")
-        #self.var.set(0)
-        if (self.type==3):
-            if (self.chan<8):
-                lString="SE Channel "
-            else:
-                lString="DE Channel "
-        else:
-            lString="A Channel "
-        if (self.type==3 and self.chan>7):         
-            self.a2dl = StringVar(root, value=lString+str(self.chan-8)+":")
-        else:
-            self.a2dl = StringVar(root, value=lString+str(self.chan)+":")
+        self.a2dl = StringVar(self.root, value=self.model.label)
         self.a2dt = Label(self.a2df,textvariable=self.valstring,fg="White",bg=BG,width=5).grid(row=0,column=2,sticky="w")
         self.a2dtxt=Entry(self.a2df,textvariable=self.a2dl,fg="White",bg=BG,bd=0,relief="flat",borderwidth=0,highlightthickness=0,width=12)
         self.a2dtxt.grid(row=0,column=1,sticky="w")
         self.a2dcanvas=Canvas(self.a2df,bg=BG,width=self.CWidth,height=mheight,bd=0,relief="flat")
         self.a2dcanvas.grid(row=0,column=3,sticky="e")
-        self.maxrange=self.CWidth
-        self.log=list(range(self.maxrange))
-        for i in range(self.maxrange):
-            self.log[i]=0.0
-        self.nextPtr=0
+        self.chart=StripChart(self.a2dcanvas,self.CWidth,self.color)
+        self.a2dl.trace_add('write',self.labelEdited)
+        self.built=True
 
         
     def cb(self):
-        if (self.var==1):
-            a=1
+        if (Logging):
+            self.var.set(int(self.model.selected))      #the log's columns are fixed until logging stops
+            return
+        self.model.selected=(self.var.get()==1)
+        replan()
             
     def deSelect(self):
-        self.a2dc.deselect()
+        if (Logging):
+            return
+        if (self.built):
+            self.a2dc.deselect()
+        self.model.selected=False
+        replan()
 
     def Select(self):
-        self.a2dc.select()
+        if (Logging):
+            return
+        if (self.built):
+            self.a2dc.select()
+        self.model.selected=True
+        replan()
         
         
-    def update(self):
-        if (self.var.get()==1):
-            if (self.type==3):
-                self.val.set(float(CMD("ADC.getADC("+str(self.addr)+','+str(self.chan)+')')))
-            elif (self.type==2):
-                self.val.set(float(CMD("DAQC2.getADC("+str(self.addr)+','+str(self.chan)+')')))
-            else:
-                self.val.set(float(CMD("DAQC.getADC("+str(self.addr)+','+str(self.chan)+')')))
-            self.valstring.set(str("{:5.3f}".format(self.val.get())))
-            self.log[self.nextPtr]=self.val.get()
-            self.nextPtr=(self.nextPtr+1)%self.maxrange
-            self.plot()
-            return self.val.get()
+    def readCmd(self):
+        if (self.type==3):
+            return "ADC.getADC("+str(self.addr)+','+str(self.chan)+')'
+        elif (self.type==2):
+            return "DAQC2.getADC("+str(self.addr)+','+str(self.chan)+')'
         else:
-            return ''
+            return "DAQC.getADC("+str(self.addr)+','+str(self.chan)+')'
 
-    def descriptors(self):
-        if (self.var.get()==1):
-            return self.a2dl.get()
+    def bulkRead(self):
+        if (self.type==3):
+            return ("ADC.getADCall("+str(self.addr)+')','list',self.chan)
+        elif (self.type==2):
+            return ("DAQC2.getADCall("+str(self.addr)+')','list',self.chan)
         else:
-            return ''
+            return ("DAQC.getADCall("+str(self.addr)+')','list',self.chan)
+
+    def post(self,val):
+        if (self.model.pending==0):
+            dirtyChans.append(self)
+        return self.model.post(val)
+
+    def setShown(self,shown):
+        self.shown=shown
+        self.render()
+
+    def descriptors(self):
+        return self.model.descriptor()
 
     def getLabel(self):
-        return self.a2dl.get()
+        return self.model.label
 
     def setLabel(self,label):
-        self.a2dl.set(label)        
+        self.model.label=label
+        if (self.built):
+            self.a2dl.set(label)        
+
+    def labelEdited(self,*args):
+        self.model.label=self.a2dl.get()
         
     def getState(self):
-        return self.var.get()        
+        return int(self.model.selected)
  
     def setState(self,state):
-        if (state=='1'):
-            self.a2dc.select()
-        else:
-            self.a2dc.deselect()
+        self.model.selected=(state=='1')
+        if (self.built):
+            self.var.set(int(self.model.selected))
+        replan()
             
-    def plot(self):
-        points=list(range(2*self.CWidth))
-        for i in range(self.CWidth):
-            j=(self.nextPtr-1+self.CWidth+i)%self.CWidth
-            if (self.type==2 or self.type==3):
-                lval=int((self.log[j]+12)/24*(SLICE-2))
-            else:
-                lval=int(self.log[j]*(SLICE-2)/4.096)
-            points[2*i]=i
-            points[2*i+1]=SLICE-1-lval
-        self.a2dcanvas.delete("all")
-        self.a2dcanvas.create_line(points, fill=self.color,width=2)       
+    def yMap(self):
+        """(offset, gain, bottom): a value v plots at bottom-int((v+offset)*gain)"""
+        if (self.type==2 or self.type==3):
+            return 12.0,(SLICE-2)/24.0,SLICE-1
+        return 0.0,(SLICE-2)/4.096,SLICE-1
+
+    def ypos(self,val):
+        offset,gain,bottom=self.yMap()
+        return bottom-int((val+offset)*gain)
+
+    def render(self):
+        """Bring the value label and trace up to date with the samples posted since the last frame"""
+        if (not self.shown or self.model.pending==0):
+            return      #a hidden page catches up when it is raised
+        self.valstring.set('---' if self.model.value==None else str("{:5.3f}".format(self.model.value)))
+        if (self.chart.drawn and self.model.pending<self.model.history.size):
+            self.chart.extend([self.ypos(val) for val in self.model.history.recent(self.model.pending)])
+        else:
+            self.redraw()
+        self.model.pending=0
+
+    def redraw(self):
+        self.chart.redraw(self.model.history.ys(*self.yMap()))
         
 class DIN:
     def __init__(self,root,addr,channel,dtype):
@@ -1309,19 +1632,15 @@ class DIN:
         self.addr=addr
         self.type=dtype
         self.chan=channel
-        self.var=IntVar()
-        self.var.set(0)    
-        self.val=IntVar()
+        self.CWidth=int(.84*W+8)
+        self.model=Channel("D Channel "+str(self.chan)+":",int,self.CWidth)
         self.color=PALETTE[channel%8]       
-        if (self.type==4):
-            #self.chan = self.chan+1
-            self.val.set(int(CMD("DIGI.getDINbit("+str(self.addr)+','+str(self.chan)+')')))        
-        elif (self.type==3):
-            self.val.set(int(CMD("ADC.getDINbit("+str(self.addr)+','+str(self.chan)+')')))
-        elif (self.type==2):
-            self.val.set(int(CMD("DAQC2.getDINbit("+str(self.addr)+','+str(self.chan)+')')))
-        else:
-            self.val.set(int(CMD("DAQC.getDINbit("+str(self.addr)+','+str(self.chan)+')')))
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.shown=False
+
+    def build(self):
+        self.var=IntVar()
+        self.var.set(int(self.model.selected))    
         self.valstring=StringVar()
         self.valstring.set('off')
         if (self.type == 4):
@@ -1335,83 +1654,116 @@ class DIN:
             off=H-2-9*SLICE+self.chan*SLICE
             mheight=SLICE
         BG='#000000000'
-        #self.CWidth=int(.85*W+14)  
-        self.CWidth=int(.84*W+8)        
         self.dinf=Frame(self.root,bg=BG,bd=0,relief="ridge")
         self.dinf.place(x=0,y=off,width=W,height=mheight)
         self.dinc=Checkbutton(self.dinf,fg="Black",bg=BG,variable=self.var,command=self.cb)
         self.dinc.grid(row=0,column=0,sticky="w")
-        self.dinl = StringVar(root, value="D Channel "+str(self.chan)+":")
+        self.dinl = StringVar(self.root, value=self.model.label)
         self.dint = Label(self.dinf,textvariable=self.valstring,fg="White",bg=BG,width=5)
         self.dint.grid(row=0,column=2,sticky="w")
         self.dintxt=Entry(self.dinf,textvariable=self.dinl,fg="White",bg=BG,bd=0,relief="flat",borderwidth=0,highlightthickness=0,width=12)
         self.dintxt.grid(row=0,column=1,sticky="w")
         self.dincanvas=Canvas(self.dinf,bg=BG,width=self.CWidth,height=mheight,bd=0,relief="flat")
         self.dincanvas.grid(row=0,column=3,sticky="e")
-        self.maxrange=self.CWidth
-        self.log=list(range(self.maxrange))
-        for i in range(self.maxrange):
-            self.log[i]=0.0
-        self.nextPtr=0
+        self.chart=StripChart(self.dincanvas,self.CWidth,self.color)
+        self.dinl.trace_add('write',self.labelEdited)
+        self.built=True
         
     def cb(self):
-        if (self.var==1):
-            a=1  
+        if (Logging):
+            self.var.set(int(self.model.selected))      #the log's columns are fixed until logging stops
+            return
+        self.model.selected=(self.var.get()==1)
+        replan()
 
     def deSelect(self):
-        self.dinc.deselect()
+        if (Logging):
+            return
+        if (self.built):
+            self.dinc.deselect()
+        self.model.selected=False
+        replan()
 
     def Select(self):
-        self.dinc.select()  
+        if (Logging):
+            return
+        if (self.built):
+            self.dinc.select()
+        self.model.selected=True
+        replan()  
         
-    def update(self):
-        if (self.var.get()==1):
-            if (self.type==4):
-                self.val.set(int(CMD("DIGI.getDINbit("+str(self.addr)+','+str(self.chan)+')')))              
-            elif (self.type==3):
-                self.val.set(int(CMD("ADC.getDINbit("+str(self.addr)+','+str(self.chan)+')')))
-            elif (self.type==2):
-                self.val.set(int(CMD("DAQC2.getDINbit("+str(self.addr)+','+str(self.chan)+')')))
-            else:
-                self.val.set(int(CMD("DAQC.getDINbit("+str(self.addr)+','+str(self.chan)+')')))
-            self.valstring.set(str(self.val.get()))
-            self.log[self.nextPtr]=self.val.get()
-            self.nextPtr=(self.nextPtr+1)%self.maxrange
-            self.plot()
-            return self.val.get()
+    def readCmd(self):
+        if (self.type==4):
+            return "DIGI.getDINbit("+str(self.addr)+','+str(self.chan)+')'
+        elif (self.type==3):
+            return "ADC.getDINbit("+str(self.addr)+','+str(self.chan)+')'
+        elif (self.type==2):
+            return "DAQC2.getDINbit("+str(self.addr)+','+str(self.chan)+')'
         else:
-            return ''
+            return "DAQC.getDINbit("+str(self.addr)+','+str(self.chan)+')'
 
-    def descriptors(self):
-        if (self.var.get()==1):
-            return self.dinl.get()
+    def bulkRead(self):
+        if (self.type==4):
+            return ("DIGI.getDINall("+str(self.addr)+')','bit',self.chan-1)
+        elif (self.type==3):
+            return ("ADC.getDINall("+str(self.addr)+')','bit',self.chan)
+        elif (self.type==2):
+            return ("DAQC2.getDINall("+str(self.addr)+')','bit',self.chan)
         else:
-            return ''            
+            return ("DAQC.getDINall("+str(self.addr)+')','bit',self.chan)
+
+    def post(self,val):
+        if (self.model.pending==0):
+            dirtyChans.append(self)
+        return self.model.post(val)
+
+    def setShown(self,shown):
+        self.shown=shown
+        self.render()
+
+    def descriptors(self):
+        return self.model.descriptor()
 
     def getLabel(self):
-        return self.dinl.get()
+        return self.model.label
 
     def setLabel(self,label):
-        self.dinl.set(label)         
+        self.model.label=label
+        if (self.built):
+            self.dinl.set(label)         
+
+    def labelEdited(self,*args):
+        self.model.label=self.dinl.get()
 
     def getState(self):
-        return self.var.get()  
+        return int(self.model.selected)
 
     def setState(self,state):
-        if (state=='1'):
-            self.dinc.select()
-        else:
-            self.dinc.deselect()
+        self.model.selected=(state=='1')
+        if (self.built):
+            self.var.set(int(self.model.selected))
+        replan()
             
-    def plot(self):
-        points=list(range(2*self.CWidth))
-        for i in range(self.CWidth):
-            j=(self.nextPtr-1+self.CWidth+i)%self.CWidth
-            lval=int(self.log[j]*(SLICE-3))
-            points[2*i]=i
-            points[2*i+1]=SLICE-1-lval
-        self.dincanvas.delete("all")
-        self.dincanvas.create_line(points, fill=self.color,width=2)
+    def yMap(self):
+        return 0.0,SLICE-3,SLICE-1
+
+    def ypos(self,val):
+        offset,gain,bottom=self.yMap()
+        return bottom-int((val+offset)*gain)
+
+    def render(self):
+        """Bring the value label and trace up to date with the samples posted since the last frame"""
+        if (not self.shown or self.model.pending==0):
+            return      #a hidden page catches up when it is raised
+        self.valstring.set('---' if self.model.value==None else str(self.model.value))
+        if (self.chart.drawn and self.model.pending<self.model.history.size):
+            self.chart.extend([self.ypos(val) for val in self.model.history.recent(self.model.pending)])
+        else:
+            self.redraw()
+        self.model.pending=0
+
+    def redraw(self):
+        self.chart.redraw(self.model.history.ys(*self.yMap()))
 
 class TEMP:
     def __init__(self,root,addr,channel,type):
@@ -1419,93 +1771,123 @@ class TEMP:
         self.root=root
         self.chan=channel+1
         self.type=type
+        self.CWidth=int(.84*W+8)
+        self.model=Channel("T Channel "+str(self.chan)+":",float,self.CWidth)
+        self.scale='c'
+        self.plotScale=self.scale
+        self.color=PALETTE[channel%8]
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.shown=False
+
+    def build(self):
         self.var=IntVar()   #This is the select button for each channel
-        self.var.set(0)
-        self.val=DoubleVar()
-        self.val.set(float(CMD('THERMO.getTEMP('+str(self.addr)+','+str(self.chan)+',"c")')))
-        self.val.set(0)
+        self.var.set(int(self.model.selected))
         self.valstring=StringVar()
         self.valstring.set('off')
-        self.color=PALETTE[channel%8]
         #self.valstring.set(str("{:4.3f}".format(self.val.get())))
         off=H-2-17*SLICE+(self.chan-1)*TSLICE
         BG='#000000000'
-        #self.CWidth=int(.85*W+8)
-        self.CWidth=int(.84*W+8)
         self.tf=Frame(self.root,bg=BG,bd=0,relief="ridge")
         self.tf.place(x=0,y=off,width=W,height=TSLICE)
         self.tc=Checkbutton(self.tf,fg="Black",bg=BG,variable=self.var,onvalue = 1, offvalue = 0,command=self.cb)
         self.tc.grid(row=0,column=0,sticky="w")
-        self.var.set(0)
-        self.tl = StringVar(root, value="T Channel "+str(self.chan)+":")
+        self.tl = StringVar(self.root, value=self.model.label)
         self.tt = Label(self.tf,textvariable=self.valstring,fg="White",bg=BG,width=7).grid(row=0,column=2,sticky="w")
         self.ttxt=Entry(self.tf,textvariable=self.tl,fg="White",bg=BG,bd=0,relief="flat",borderwidth=0,highlightthickness=0,width=11)
         self.ttxt.grid(row=0,column=1,sticky="w")
         self.tcanvas=Canvas(self.tf,bg=BG,width=self.CWidth,height=TSLICE,bd=0,relief="flat")
         self.tcanvas.grid(row=0,column=3,sticky="e")
-        self.maxrange=self.CWidth
-        self.log=list(range(self.maxrange))
-        for i in range(self.maxrange):
-            self.log[i]=0.0
-        self.nextPtr=0
+        self.chart=StripChart(self.tcanvas,self.CWidth,self.color)
+        self.tl.trace_add('write',self.labelEdited)
+        self.built=True
         
     def cb(self):
-        if (self.var==1):
-            a=1
+        if (Logging):
+            self.var.set(int(self.model.selected))      #the log's columns are fixed until logging stops
+            return
+        self.model.selected=(self.var.get()==1)
+        replan()
             
     def deSelect(self):
-        self.tc.deselect()
+        if (Logging):
+            return
+        if (self.built):
+            self.tc.deselect()
+        self.model.selected=False
+        replan()
 
     def Select(self):
-        self.tc.select()              
+        if (Logging):
+            return
+        if (self.built):
+            self.tc.select()
+        self.model.selected=True
+        replan()              
         
-    def update(self,scale):
-        if (self.var.get()==1):
-            self.val.set(float(CMD('THERMO.getTEMP('+str(self.addr)+','+str(self.chan)+',"'+scale+'")')))
-            self.valstring.set(str("{:4.3f}".format(self.val.get())))
-            self.log[self.nextPtr]=self.val.get()
-            self.nextPtr=(self.nextPtr+1)%self.maxrange
-            self.plot(scale)
-            return self.val.get()
-        else:
-            return ''
+    def readCmd(self):
+        return 'THERMO.getTEMP('+str(self.addr)+','+str(self.chan)+',"'+self.scale+'")'
+
+    def bulkRead(self):
+        return None     #no whole-plate temperature command
+
+    def post(self,val):
+        if (self.model.pending==0):
+            dirtyChans.append(self)
+        return self.model.post(val)
+
+    def setShown(self,shown):
+        self.shown=shown
+        self.render()
 
     def descriptors(self):
-        if (self.var.get()==1):
-            return self.tl.get()
-        else:
-            return ''
+        return self.model.descriptor()
 
     def getLabel(self):
-        return self.tl.get()
+        return self.model.label
 
     def setLabel(self,label):
-        self.tl.set(label)        
+        self.model.label=label
+        if (self.built):
+            self.tl.set(label)        
+
+    def labelEdited(self,*args):
+        self.model.label=self.tl.get()
         
     def getState(self):
-        return self.var.get()        
+        return int(self.model.selected)
  
     def setState(self,state):
-        if (state=='1'):
-            self.tc.select()
-        else:
-            self.tc.deselect()
+        self.model.selected=(state=='1')
+        if (self.built):
+            self.var.set(int(self.model.selected))
+        replan()
             
-    def plot(self,scale):
-        points=list(range(2*self.CWidth))
-        for i in range(self.CWidth):
-            j=(self.nextPtr-1+self.CWidth+i)%self.CWidth
-            if (scale=='c'):
-                lval=int((self.log[j]+55)/180*(TSLICE-2))
-            elif (scale=='f'):
-                lval=int((self.log[j]+67)/325*(TSLICE-2))
-            else:
-                lval=int((self.log[j]-218)/180*(TSLICE-2))
-            #lval=int(self.log[j]*(TSLICE-2)/4.096)
-            points[2*i]=i
-            points[2*i+1]=TSLICE-1-lval
-        self.tcanvas.delete("all")
-        self.tcanvas.create_line(points, fill=self.color,width=2)
+    def yMap(self):
+        if (self.plotScale=='c'):
+            return 55.0,(TSLICE-2)/180.0,TSLICE-1
+        elif (self.plotScale=='f'):
+            return 67.0,(TSLICE-2)/325.0,TSLICE-1
+        else:
+            return -218.0,(TSLICE-2)/180.0,TSLICE-1
+
+    def ypos(self,val):
+        offset,gain,bottom=self.yMap()
+        return bottom-int((val+offset)*gain)
+
+    def render(self):
+        """Bring the value label and trace up to date with the samples posted since the last frame"""
+        if (not self.shown or self.model.pending==0):
+            return      #a hidden page catches up when it is raised
+        self.valstring.set('---' if self.model.value==None else str("{:4.3f}".format(self.model.value)))
+        if (self.chart.drawn and self.plotScale==self.scale and self.model.pending<self.model.history.size):
+            self.chart.extend([self.ypos(val) for val in self.model.history.recent(self.model.pending)])
+        else:
+            self.redraw()
+        self.model.pending=0
+
+    def redraw(self):
+        self.plotScale=self.scale       #a new scale redraws the whole trace
+        self.chart.redraw(self.model.history.ys(*self.yMap()))
 
 class AMPS:
     def __init__(self,root,addr,channel,type):
@@ -1514,92 +1896,120 @@ class AMPS:
         self.chan=channel+1
         self.type=type
         self.color=PALETTE[channel%8]
+        self.CWidth=int(.84*W+8)
+        self.model=Channel("4-20mA "+str(self.chan)+":",float,self.CWidth)
+        self.built=False        #widgets are created by build() when the page is first raised
+        self.shown=False
+
+    def build(self):
         self.var=IntVar()   #This is the select button for each channel
-        self.var.set(0)
-        self.val=DoubleVar()
-        if (self.type==3):
-            self.val.set(float(CMD("ADC.getADC("+str(self.addr)+','+str(self.chan)+')')))
-        else:
-            self.val.set(float(CMD("CURRENT.getI("+str(self.addr)+','+str(self.chan)+')')))
-        self.val.set(0)
+        self.var.set(int(self.model.selected))
         self.valstring=StringVar()
         self.valstring.set('off')
         off=H-2-17*SLICE+(self.chan-1)*ISLICE
         BG='#000000000'
-        #self.CWidth=int(.85*W+14)
-        self.CWidth=int(.84*W+8)
         self.tf=Frame(self.root,bg=BG,bd=0,relief="ridge")
         self.tf.place(x=0,y=off,width=W,height=ISLICE)
         self.tc=Checkbutton(self.tf,fg="Black",bg=BG,variable=self.var,onvalue = 1, offvalue = 0,command=self.cb)
         self.tc.grid(row=0,column=0,sticky="w")
-        self.var.set(0)
-        self.tl = StringVar(root, value="4-20mA "+str(self.chan)+":")
+        self.tl = StringVar(self.root, value=self.model.label)
         self.tt = Label(self.tf,textvariable=self.valstring,fg="White",bg=BG,width=5)
         self.tt.grid(row=0,column=2,sticky="w")
         self.ttxt=Entry(self.tf,textvariable=self.tl,fg="White",bg=BG,bd=0,relief="flat",borderwidth=0,highlightthickness=0,width=12)
         self.ttxt.grid(row=0,column=1,sticky="w")
         self.icanvas=Canvas(self.tf,bg=BG,width=self.CWidth,height=ISLICE,bd=0,relief="flat")
         self.icanvas.grid(row=0,column=3,sticky="e")
-        self.maxrange=self.CWidth
-        self.log=list(range(self.maxrange))
-        for i in range(self.maxrange):
-            self.log[i]=0.0
-        self.nextPtr=0
+        self.chart=StripChart(self.icanvas,self.CWidth,self.color)
+        self.tl.trace_add('write',self.labelEdited)
+        self.built=True
         
     def cb(self):
-        if (self.var==1):
-            a=1
+        if (Logging):
+            self.var.set(int(self.model.selected))      #the log's columns are fixed until logging stops
+            return
+        self.model.selected=(self.var.get()==1)
+        replan()
             
     def deSelect(self):
-        self.tc.deselect()
+        if (Logging):
+            return
+        if (self.built):
+            self.tc.deselect()
+        self.model.selected=False
+        replan()
 
     def Select(self):
-        self.tc.select()              
+        if (Logging):
+            return
+        if (self.built):
+            self.tc.select()
+        self.model.selected=True
+        replan()              
         
-    def update(self):
-        if (self.var.get()==1):
-            if (self.type==3):
-                self.val.set(float(CMD("ADC.getADC("+str(self.addr)+','+str(self.chan)+')')))
-            else:
-                self.val.set(float(CMD("CURRENT.getI("+str(self.addr)+','+str(self.chan)+')')))
-            self.valstring.set(str("{:4.3f}".format(self.val.get())))
-            self.log[self.nextPtr]=self.val.get()
-            self.nextPtr=(self.nextPtr+1)%self.maxrange
-            self.plot()
-            return self.val.get()
+    def readCmd(self):
+        if (self.type==3):
+            return "ADC.getADC("+str(self.addr)+','+str(self.chan)+')'
         else:
-            return ''
+            return "CURRENT.getI("+str(self.addr)+','+str(self.chan)+')'
 
-    def descriptors(self):
-        if (self.var.get()==1):
-            return self.tl.get()
+    def bulkRead(self):
+        if (self.type==3):
+            return ("ADC.getADCall("+str(self.addr)+')','list',self.chan)
         else:
-            return ''
+            return None     #no whole-plate current command
+
+    def post(self,val):
+        if (self.model.pending==0):
+            dirtyChans.append(self)
+        return self.model.post(val)
+
+    def setShown(self,shown):
+        self.shown=shown
+        self.render()
+
+    def descriptors(self):
+        return self.model.descriptor()
 
     def getLabel(self):
-        return self.tl.get()
+        return self.model.label
 
     def setLabel(self,label):
-        self.tl.set(label)        
+        self.model.label=label
+        if (self.built):
+            self.tl.set(label)        
+
+    def labelEdited(self,*args):
+        self.model.label=self.tl.get()
         
     def getState(self):
-        return self.var.get()        
+        return int(self.model.selected)
  
     def setState(self,state):
-        if (state=='1'):
-            self.tc.select()
-        else:
-            self.tc.deselect()
+        self.model.selected=(state=='1')
+        if (self.built):
+            self.var.set(int(self.model.selected))
+        replan()
           
-    def plot(self):
-        points=list(range(2*self.CWidth))
-        for i in range(self.CWidth):
-            j=(self.nextPtr-1+self.CWidth+i)%self.CWidth
-            lval=int(self.log[j]*(ISLICE-2)/20.0)
-            points[2*i]=i
-            points[2*i+1]=ISLICE-1-lval
-        self.icanvas.delete("all")
-        self.icanvas.create_line(points, fill=self.color,width=2)  
+    def yMap(self):
+        return 0.0,(ISLICE-2)/20.0,ISLICE-1
+
+    def ypos(self,val):
+        offset,gain,bottom=self.yMap()
+        return bottom-int((val+offset)*gain)
+
+    def render(self):
+        """Bring the value label and trace up to date with the samples posted since the last frame"""
+        if (not self.shown or self.model.pending==0):
+            return      #a hidden page catches up when it is raised
+        self.valstring.set('---' if self.model.value==None else str("{:4.3f}".format(self.model.value)))
+        if (self.chart.drawn and self.model.pending<self.model.history.size):
+            self.chart.extend([self.ypos(val) for val in self.model.history.recent(self.model.pending)])
+        else:
+            self.redraw()
+        self.model.pending=0
+
+    def redraw(self):
+        self.chart.redraw(self.model.history.ys(*self.yMap()))
         
 def center(win):
     """
@@ -1623,6 +2033,7 @@ SampleT=0.2
 theta=[0,0,0,0,0,0,0,0]  
 dnum=[0,0,0,0,0,0,0,0]
 SampleC=0
+Continuous=False
 logFile=0
 lfOpen=False
 streamOpen=False
@@ -1630,10 +2041,30 @@ Logging=False
 logHeader=''
 streamer=0
 fName=''
+pageDash={}      #notebook page name -> the dashboard drawn on it
+planDirty=True
+planChans=[]
+planId=0
+planSkew=False      #the plan appends per-plate read time columns
+dirtyChans=[]       #channels with samples posted since the last frame
+lockedControls=[]   #rate, deadband and scale controls disabled while logging
+titleDirty=False    #samples were logged since the title bar was last drawn
+DRAIN_MS=20     #how often the GUI collects finished rows from the acquisition engine
+DISPLAY_FPS=15      #default screen refresh rate; sampling runs independently of it
+LOG_BEHIND=1000     #rows waiting for the disk before the title bar warns about it
+PIPELINE_DEPTH=16   #commands sent to the BRIDGEplate ahead of their replies (1 = one round trip per command)
+
+parser=argparse.ArgumentParser(description='Pi-Plates Data Logger')
+parser.add_argument('--port',help='serial port to use instead of searching for the BRIDGEplate, e.g. one opened by loggerEMU.py')
+parser.add_argument('--rescan',action='store_true',help='probe the plate stack instead of starting from the cached one')
+args=parser.parse_args()
 
 vid="2E8A"
 pid="10E3"
-matches = find_ports_by_vid_pid(vid,pid)
+if (args.port):
+    matches = args.port
+else:
+    matches = find_ports_by_vid_pid(vid,pid)
 if (matches):
     ser = serial.Serial(matches, 115200, timeout=20) # Open port at 115200 baud, with a 20-second timeout (for slow sample rates)
 else:
@@ -1641,8 +2072,18 @@ else:
     print("Exiting program...")
     sys.exit(0)
 
+#reopenBridge: called in the background after the BRIDGEplate is lost until it can be opened again
+def reopenBridge():
+    port=args.port or find_ports_by_vid_pid(vid,pid)
+    if (not port):
+        return None
+    s=serial.Serial(port,115200,timeout=20)
+    s.reset_input_buffer()
+    return s
+
 ser.flush()
 ser.reset_input_buffer()
+bridge=Bridge(ser,PIPELINE_DEPTH,reopen=reopenBridge)
 
 root = Tk()
 root.resizable(0,0)
@@ -1695,114 +2136,116 @@ helpmenu.add_command(label="About", command=About)
 #def callback():
 #    print ("click!")
 
-notebook = Pmw.NoteBook(root,borderwidth=2,pagemargin=2)
+notebook = Pmw.NoteBook(root,borderwidth=2,pagemargin=2,raisecommand=pageRaised)
 notebook.pack(fill = 'both', expand = 1)
 
-SampleTmin=0.01
+SampleTmin=0.01         #replaced by the acquisition engine's measurement once channels are selected
 focusSet=False
 print()
 print('Identifying and initializing Pi-Plates...')
+tStart=time.monotonic()
+times={'probe':0.0,'init':0.0}
+topologyKey=bridgeSerial(matches)
+topologyCheck=None
+stack=None if args.rescan else loadTopology(topologyKey)
+if (stack!=None):
+    print('Using the cached plate stack of BRIDGEplate '+topologyKey+' (checking it in the background)')
+    initPlates(bridge,stack)
+    times['init']=time.monotonic()-tStart
+    topologyCheck=TopologyCheck(bridge,topologyKey,matches,stack)
+else:
+    stack=discoverPlates(bridge,True,times)
+    saveTopology(topologyKey,matches,stack)
 
 DAQC2present=8*[False]
 DAQC2o=list(range(8))
 DAQC2FoundCount=0
-for i in range (0,8):
-    resp=CMD("DAQC2.getADDR("+str(i)+")")
-    if (resp[0]==str(i)):
-        DAQC2present[i]=True
-        DAQC2FoundCount+=1     
-        page = notebook.add('DAQC2-'+str(i))
-        if (focusSet==False):
-            notebook.tab('DAQC2-'+str(i)).focus_set()
-            focusSet=True
-        DAQC2o[i]=daqcDASH(page,i,2)
-        SampleTmin+=0.15
+for i in stack['DAQC2']:
+    DAQC2present[i]=True
+    DAQC2FoundCount+=1     
+    page = notebook.add('DAQC2-'+str(i))
+    if (focusSet==False):
+        notebook.tab('DAQC2-'+str(i)).focus_set()
+        focusSet=True
+    DAQC2o[i]=daqcDASH(page,i,2)
+    pageDash['DAQC2-'+str(i)]=DAQC2o[i]
 
 DAQCpresent=8*[False]
 DAQCo=list(range(8))
 DAQCFoundCount=0
-for i in range(8):
-    resp=CMD("DAQC.getADDR("+str(i)+")")
-    if (resp[0]==str(i)):
-        DAQCpresent[i]=True
-        DAQCFoundCount+=1   
-        page = notebook.add('DAQC-'+str(i))
-        if (focusSet==False):
-            notebook.tab('DAQC-'+str(i)).focus_set()
-            focusSet=True
-        DAQCo[i]=daqcDASH(page,i,1)
-        SampleTmin+=0.2
+for i in stack['DAQC']:
+    DAQCpresent[i]=True
+    DAQCFoundCount+=1   
+    page = notebook.add('DAQC-'+str(i))
+    if (focusSet==False):
+        notebook.tab('DAQC-'+str(i)).focus_set()
+        focusSet=True
+    DAQCo[i]=daqcDASH(page,i,1)
+    pageDash['DAQC-'+str(i)]=DAQCo[i]
 
 THERMOpresent=8*[False]
 THERMOo=list(range(8))
 THERMOFoundCount=0
-for i in range (0,8):
-    resp=CMD("THERMO.getADDR("+str(i)+")")
-    if (resp[0]==str(i)):
-        THERMOpresent[i]=True
-        THERMOFoundCount+=1   
-        page = notebook.add('THERMO-'+str(i))
-        if (focusSet==False):
-            notebook.tab('THERMO-'+str(i)).focus_set()
-            focusSet=True
-        THERMOo[i]=thermoDASH(page,i,1)
-        SampleTmin+=0.15
+for i in stack['THERMO']:
+    THERMOpresent[i]=True
+    THERMOFoundCount+=1   
+    page = notebook.add('THERMO-'+str(i))
+    if (focusSet==False):
+        notebook.tab('THERMO-'+str(i)).focus_set()
+        focusSet=True
+    THERMOo[i]=thermoDASH(page,i,1)
+    pageDash['THERMO-'+str(i)]=THERMOo[i]
 
 CURRENTpresent=8*[False]
 CURRENTo=list(range(8)) 
 CURRENTFoundCount=0
-for i in range (0,8):
-    resp=CMD("CURRENT.getADDR("+str(i)+")")
-    if (resp[0]==str(i)):
-        CURRENTpresent[i]=True
-        CURRENTFoundCount+=1   
-        page = notebook.add('CURRENT-'+str(i))
-        if (focusSet==False):
-            notebook.tab('CURRENT-'+str(i)).focus_set()
-            focusSet=True
-        CURRENTo[i]=currentDASH(page,i,1)
-        SampleTmin+=0.15
+for i in stack['CURRENT']:
+    CURRENTpresent[i]=True
+    CURRENTFoundCount+=1   
+    page = notebook.add('CURRENT-'+str(i))
+    if (focusSet==False):
+        notebook.tab('CURRENT-'+str(i)).focus_set()
+        focusSet=True
+    CURRENTo[i]=currentDASH(page,i,1)
+    pageDash['CURRENT-'+str(i)]=CURRENTo[i]
 
 DIGIpresent=8*[False]
 DIGIo=list(range(8)) 
 DIGIFoundCount=0
-for i in range (0,8):
-    resp=CMD("DIGI.getADDR("+str(i)+")")
-    if (resp[0]==str(i)):
-        DIGIpresent[i]=True
-        DIGIFoundCount+=1   
-        page = notebook.add('DIGI-'+str(i))
-        if (focusSet==False):
-            notebook.tab('DIGI-'+str(i)).focus_set()
-            focusSet=True
-        DIGIo[i]=digiDASH(page,i,4)
-        SampleTmin+=0.15
+for i in stack['DIGI']:
+    DIGIpresent[i]=True
+    DIGIFoundCount+=1   
+    page = notebook.add('DIGI-'+str(i))
+    if (focusSet==False):
+        notebook.tab('DIGI-'+str(i)).focus_set()
+        focusSet=True
+    DIGIo[i]=digiDASH(page,i,4)
+    pageDash['DIGI-'+str(i)]=DIGIo[i]
 
 ADCpresent=8*[False]
 ADCo1=list(range(8))
 ADCo2=list(range(8)) 
 ADCFoundCount=0
-for i in range (0,8):
-    resp=CMD("ADC.getADDR("+str(i)+")")
-    if (resp[0]==str(i)):
-        ADCpresent[i]=True
-        resp=CMD("ADC.initADC("+str(i)+")")
-        page1 = notebook.add('ADC-'+str(i)+'/1')
-        page2 = notebook.add('ADC-'+str(i)+'/2')
-        if (focusSet==False):
-            notebook.tab('ADC-'+str(i)+'/1').focus_set()
-            focusSet=True
-        ADCo1[i]=adc1DASH(page1,i,3)
-        ADCo2[i]=adc2DASH(page2,i,3)
-        arg=(CMD("ADC.setMODE("+str(i)+",slow)"))
-        SampleTmin+=0.15
-        
-
+for i in stack['ADC']:
+    ADCpresent[i]=True
+    page1 = notebook.add('ADC-'+str(i)+'/1')
+    page2 = notebook.add('ADC-'+str(i)+'/2')
+    if (focusSet==False):
+        notebook.tab('ADC-'+str(i)+'/1').focus_set()
+        focusSet=True
+    ADCo1[i]=adc1DASH(page1,i,3)
+    ADCo2[i]=adc2DASH(page2,i,3)
+    pageDash['ADC-'+str(i)+'/1']=ADCo1[i]
+    pageDash['ADC-'+str(i)+'/2']=ADCo2[i]
+
+bridge.onReconnect=lambda: initPlates(bridge,stack)      #a reconnected stack may have lost its ADCplate set-up
+
+tPages=time.monotonic()-tStart-times['probe']-times['init']
+print('Found '+describeStack(stack))
+print('Startup: probes '+str(round(times['probe']*1000))+' ms, ADC init '+str(round(times['init']*1000))
+      +' ms, pages '+str(round(tPages*1000))+' ms, total '+str(round((time.monotonic()-tStart)*1000))+' ms')
       
-if (SampleTmin>0):
-    SampleT=SampleTmin
-else:
-    SampleT=0.2
+SampleT=0.2
 
 SamplePeriod=StringVar()
 SamplePeriod.set(str(round(SampleT,3)))
@@ -1812,10 +2255,48 @@ SampleCount.set('1000')
 
 sDval=StringVar()
 sDval.set(str(float(SamplePeriod.get())*float(SampleCount.get())))
+
+FlushRows=StringVar()
+FlushRows.set('100')
+FlushSecs=StringVar()
+FlushSecs.set('1.0')
+FsyncSecs=StringVar()
+FsyncSecs.set('0')
+SegmentMB=StringVar()
+SegmentMB.set('0')
+SegmentMins=StringVar()
+SegmentMins.set('0')
+SegmentAt=StringVar()
+SegmentAt.set('off')
+LogCodec=StringVar()
+LogCodec.set('none')
+DisplayFPS=StringVar()
+DisplayFPS.set(str(DISPLAY_FPS))
+LogLayout=StringVar()
+LogLayout.set('dense')
+LogChanges=StringVar()
+LogChanges.set('off')
+KeyframeSecs=StringVar()
+KeyframeSecs.set(str(KEYFRAME_SECS))
+LogStamps=StringVar()
+LogStamps.set('local')
+SkewColumns=StringVar()
+SkewColumns.set('off')
+SkewColumns.trace_add('write',lambda *args: replan())
+
+sTmin=StringVar()
+sTmin.set(str(SampleTmin)+'):')
     
 notebook.setnaturalsize() 
+pageRaised(notebook.getcurselection())
 root.wm_deiconify() #bring window to the front
-root.after(int(SampleT*1000),task) 
+engine=AcqEngine(bridge,SampleT)
+engine.start()
+if (topologyCheck):
+    topologyCheck.start()
+    root.after(500,checkTopology)
+root.after(DRAIN_MS,task) 
+root.after(int(1000/DISPLAY_FPS),render)
 
 root.after(500,doUpdates) 
 print ()
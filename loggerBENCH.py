@@ -0,0 +1,236 @@
+"""
+File: loggerBENCH.py
+Description: Acquisition benchmark for PIPLATElogger. Runs the logger's acquisition path against a real
+BRIDGEplate (--port) or an emulated plate stack and reports samples/sec, tick latency percentiles,
+time per command for each plate type and the per-sample cost of formatting, disk and GUI drawing.
+Results are written as JSON so runs can be compared between versions. Usage:
+    python loggerBENCH.py --daqc2 0 1 --thermo 0 --latency 0.001 --out before.json
+    python loggerBENCH.py --port COM5 --seconds 20
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+import serial
+
+from loggerIO import Bridge, discoverPlates, plateReads, planReads, unpack, PLATES, BULK_MIN
+from loggerLOG import CsvFormat, BinaryFormat
+from loggerCHART import StripChart
+import loggerEMU
+
+GUI_WIDTH=int(.84*1280+8)     #strip chart width used by the logger's channel canvases
+GUI_SLICE=40
+
+
+def percentile(vals,p):
+    if (len(vals)==0):
+        return 0.0
+    v=sorted(vals)
+    return v[min(len(v)-1,int(round(p/100.0*(len(v)-1))))]
+
+def summary(times):
+    """mean/p50/p99/max of a list of durations in seconds, reported in milliseconds"""
+    if (len(times)==0):
+        return {'n':0}
+    return {'n':len(times),
+            'mean_ms':round(1000*sum(times)/len(times),4),
+            'p50_ms':round(1000*percentile(times,50),4),
+            'p99_ms':round(1000*percentile(times,99),4),
+            'max_ms':round(1000*max(times),4)}
+
+def openBridge(args):
+    """Returns (bridge, emulator or None)"""
+    emu=None
+    if (args.port):
+        port=args.port
+    else:
+        emu=loggerEMU.emulatorFromArgs(args)
+        server=loggerEMU.PtyServer(emu)
+        server.start()
+        port=server.port
+    ser=serial.Serial(port,115200,timeout=20)
+    ser.reset_input_buffer()
+    return Bridge(ser,args.depth),emu
+
+def benchCommands(bridge,stack,count):
+    """Round trip time of every distinct single and whole-plate command, per plate type"""
+    out={}
+    for plate in PLATES:
+        if (len(stack[plate])==0):
+            continue
+        cmds={}
+        for label,cmd,conv,bulk in plateReads(plate,stack[plate][0]):
+            cmds.setdefault(cmd.split('(')[0],cmd)
+            if (bulk):
+                cmds.setdefault(bulk[0].split('(')[0],bulk[0])
+        out[plate]={}
+        for name,cmd in cmds.items():
+            times=[]
+            for k in range(count):
+                t0=time.perf_counter()
+                bridge.CMD(cmd)
+                times.append(time.perf_counter()-t0)
+            out[plate][name]=summary(times)
+    return out
+
+def benchAcquisition(bridge,reads,seconds,bulkMin):
+    """Free-running acquisition ticks over all channels for the given time"""
+    cmds,picks=planReads([(cmd,conv,bulk) for label,cmd,conv,bulk in reads],bulkMin)
+    times=[]
+    rows=[]
+    tEnd=time.perf_counter()+seconds
+    while (time.perf_counter()<tEnd):
+        t0=time.perf_counter()
+        vals=unpack(bridge.batch(cmds),picks)
+        times.append(time.perf_counter()-t0)
+        rows.append((time.time(),vals))
+    total=sum(times)
+    return {'ticks':len(times),
+            'commands_per_tick':len(cmds),
+            'channels':len(reads),
+            'samples_per_sec':round(len(times)/total,3) if total>0 else 0.0,
+            'channel_reads_per_sec':round(len(times)*len(reads)/total,1) if total>0 else 0.0,
+            'tick':summary(times)},rows
+
+def benchFormatting(rows,fmt):
+    """Per-row cost of turning samples into file bytes with a loggerLOG format"""
+    times=[]
+    lines=[]
+    for stamp,vals in rows:
+        t0=time.perf_counter()
+        lines.append(fmt.row(stamp,vals))
+        times.append(time.perf_counter()-t0)
+    res=summary(times)
+    res['bytes_per_row']=round(sum(len(l) for l in lines)/max(1,len(lines)),1)
+    return res,lines
+
+def benchDisk(lines,directory):
+    fd,path=tempfile.mkstemp(suffix='.csv',dir=directory)
+    os.close(fd)
+    times=[]
+    try:
+        logFile=open(path,'wb')
+        for line in lines:
+            t0=time.perf_counter()
+            logFile.write(line)
+            times.append(time.perf_counter()-t0)
+        t0=time.perf_counter()
+        logFile.flush()
+        os.fsync(logFile.fileno())
+        logFile.close()
+        closeTime=time.perf_counter()-t0
+    finally:
+        os.remove(path)
+    res=summary(times)
+    res['close_fsync_ms']=round(1000*closeTime,4)
+    return res
+
+def benchGui(nchan,frames):
+    """Per-sample cost of updating nchan strip charts the way the logger does.
+    Returns None when no display is available."""
+    try:
+        import tkinter
+        root=tkinter.Tk()
+    except Exception:
+        return None
+    charts=[]
+    for k in range(nchan):
+        c=tkinter.Canvas(root,width=GUI_WIDTH,height=GUI_SLICE)
+        c.pack()
+        charts.append(StripChart(c,GUI_WIDTH,'#FFFFFF'))
+        charts[k].redraw([GUI_SLICE//2]*GUI_WIDTH)
+    times=[]
+    for f in range(frames):
+        t0=time.perf_counter()
+        for k in range(nchan):
+            charts[k].add(GUI_SLICE-1-int((f%50)/50.0*(GUI_SLICE-2)))
+        root.update()
+        times.append(time.perf_counter()-t0)
+    root.destroy()
+    return summary(times)
+
+def gitVersion():
+    try:
+        return subprocess.check_output(['git','describe','--always','--dirty'],cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ''
+
+def main():
+    parser=argparse.ArgumentParser(description='PIPLATElogger acquisition benchmark')
+    parser.add_argument('--port',help='benchmark a real BRIDGEplate on this port instead of the emulator')
+    loggerEMU.addStackArgs(parser)
+    parser.add_argument('--seconds',type=float,default=5.0,help='length of the acquisition run')
+    parser.add_argument('--commands',type=int,default=50,help='round trips timed per command')
+    parser.add_argument('--depth',type=int,default=16,help='command pipeline depth')
+    parser.add_argument('--bulk-min',type=int,default=BULK_MIN,help='channels per plate before whole-plate reads are used')
+    parser.add_argument('--gui-frames',type=int,default=50,help='redraws timed for the GUI cost (0 to skip)')
+    parser.add_argument('--label',default='',help='free text stored with the results')
+    parser.add_argument('--out',default='bench-results.json',help='JSON results file')
+    args=parser.parse_args()
+
+    bridge,emu=openBridge(args)
+    t0=time.perf_counter()
+    stack=discoverPlates(bridge)
+    discoverTime=time.perf_counter()-t0
+    reads=[]
+    for plate in PLATES:
+        for addr in stack[plate]:
+            reads+=plateReads(plate,addr)
+    if (len(reads)==0):
+        print('No plates found')
+        sys.exit(1)
+
+    print('Timing single commands...')
+    commands=benchCommands(bridge,stack,args.commands)
+    print('Running acquisition for '+str(args.seconds)+' seconds...')
+    acq,rows=benchAcquisition(bridge,reads,args.seconds,args.bulk_min)
+    header='Date/Time,'+','.join(label for label,cmd,conv,bulk in reads)
+    fmt,lines=benchFormatting(rows,CsvFormat(header))
+    binFmt,binLines=benchFormatting(rows,BinaryFormat(header,['i1' if conv==int else 'f8' for label,cmd,conv,bulk in reads]))
+    disk=benchDisk(lines,os.path.dirname(os.path.abspath(args.out)))
+    gui=benchGui(len(reads),args.gui_frames) if args.gui_frames>0 else None
+
+    perSample={'acquisition_ms':acq['tick'].get('mean_ms',0.0),
+               'formatting_ms':fmt.get('mean_ms',0.0),
+               'disk_ms':disk.get('mean_ms',0.0),
+               'gui_ms':gui['mean_ms'] if gui else None}
+    results={'label':args.label,
+             'version':gitVersion(),
+             'date':datetime.datetime.now().isoformat(timespec='seconds'),
+             'python':platform.python_version(),
+             'platform':platform.platform(),
+             'config':{'port':args.port,'emulated':emu!=None,'stack':stack,
+                       'latency':args.latency if emu else None,
+                       'depth':args.depth,'bulk_min':args.bulk_min,'seconds':args.seconds},
+             'discovery_ms':round(1000*discoverTime,3),
+             'commands':commands,
+             'acquisition':acq,
+             'formatting':fmt,
+             'formatting_binary':binFmt,
+             'disk':disk,
+             'gui':gui,
+             'per_sample':perSample}
+    with open(args.out,'w') as f:
+        json.dump(results,f,indent=2)
+
+    print()
+    print('Stack: '+', '.join(p+' '+','.join(str(a) for a in stack[p]) for p in PLATES if stack[p]))
+    print('Channels: '+str(acq['channels'])+'   commands per tick: '+str(acq['commands_per_tick']))
+    print('Samples/sec: '+str(acq['samples_per_sec'])+'   tick p50/p99: '+str(acq['tick']['p50_ms'])+'/'+str(acq['tick']['p99_ms'])+' ms')
+    for plate in commands:
+        for name,res in commands[plate].items():
+            print('  '+name.ljust(20)+str(res['mean_ms']).rjust(10)+' ms')
+    for key,val in perSample.items():
+        print(key.ljust(16)+('n/a' if val==None else str(val)+' ms'))
+    print('Results written to '+args.out)
+
+if __name__ == '__main__':
+    main()
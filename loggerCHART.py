@@ -0,0 +1,114 @@
+"""
+File: loggerCHART.py
+Description: Scrolling strip chart and sample history used for every channel trace in PIPLATElogger.
+"""
+
+import array
+import collections
+try:
+    import numpy
+except ImportError:
+    numpy=None          #History falls back to the array module
+
+
+class History:
+    """The last size samples of one channel as a ring of doubles, held in a NumPy
+    array when NumPy is installed and in an array('d') otherwise. ys() turns the
+    whole ring into screen heights in one pass for a full redraw."""
+    def __init__(self,size):
+        self.size=size
+        if (numpy!=None):
+            self.data=numpy.zeros(size)
+        else:
+            self.data=array.array('d',bytes(8*size))
+        self.next=0
+
+    def append(self,val):
+        self.data[self.next]=val
+        self.next=(self.next+1)%self.size
+
+    def latest(self):
+        return self.data[self.next-1]
+
+    def recent(self,n):
+        """The newest n samples, oldest first"""
+        return [self.data[(self.next-n+k)%self.size] for k in range(n)]
+
+    def ordered(self):
+        """All samples, oldest first"""
+        if (numpy!=None):
+            return numpy.concatenate((self.data[self.next:],self.data[:self.next]))
+        return self.data[self.next:]+self.data[:self.next]
+
+    def ys(self,offset,gain,bottom):
+        """Screen height bottom-int((v+offset)*gain) of every sample, oldest first"""
+        vals=self.ordered()
+        if (numpy!=None):
+            return (bottom-((vals+offset)*gain).astype(int)).tolist()
+        return [bottom-int((v+offset)*gain) for v in vals]
+
+
+class StripChart:
+    """Scrolling trace on a Tk canvas, drawn as a single line item. Each new sample
+    appends one point to the line at the right edge, drops the point that scrolled
+    off the left and scrolls the view by one pixel, so the work per sample does not
+    grow with the canvas width. redraw() sets every point with one coords call
+    when the scaling changes."""
+    def __init__(self,canvas,width,color):
+        self.canvas=canvas
+        self.width=width
+        self.color=color
+        self.canvas.configure(confine=False,xscrollincrement=1)
+        self.x=width-1          #canvas x of the newest sample; the view shows x-width+1 .. x
+        self.line=None          #the line item, made by the first redraw() or extend()
+        self.points=0
+        self.drawn=False
+
+    def add(self,y):
+        """Append one sample at screen height y"""
+        self.extend([y])
+
+    def extend(self,ys):
+        """Append several samples, oldest first, with a single scroll of the view"""
+        if (len(ys)==0):
+            return
+        flat=self.flatten(self.x+1,ys)
+        self.x+=len(ys)
+        if (self.line==None):
+            self.setLine(flat)
+        else:
+            self.canvas.insert(self.line,'end',flat)
+            self.points+=len(ys)
+        extra=self.points-self.width
+        if (extra>0):
+            self.canvas.dchars(self.line,0,2*extra-1)     #line indices count x and y separately
+            self.points-=extra
+        self.canvas.xview_scroll(len(ys),'units')
+
+    def redraw(self,ys):
+        """Replace the trace with ys, oldest first, ending at the newest sample"""
+        ys=ys[-self.width:]
+        if (len(ys)==0):
+            if (self.line!=None):
+                self.canvas.delete(self.line)
+            self.line=None
+            self.points=0
+        else:
+            self.setLine(self.flatten(self.x-len(ys)+1,ys))
+        self.drawn=True
+
+    def flatten(self,left,ys):
+        """x0,y0,x1,y1,... for ys drawn from canvas x left onwards"""
+        flat=[0]*(2*len(ys))
+        flat[0::2]=range(left,left+len(ys))
+        flat[1::2]=ys
+        return flat
+
+    def setLine(self,flat):
+        if (len(flat)==2):
+            flat=flat+flat      #a line item needs two points
+        self.points=len(flat)//2
+        if (self.line==None):
+            self.line=self.canvas.create_line(*flat,fill=self.color,width=2)
+        else:
+            self.canvas.coords(self.line,*flat)
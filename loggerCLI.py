@@ -0,0 +1,353 @@
+"""
+File: loggerCLI.py
+Description: Headless PIPLATElogger for servers, SSH sessions and services. Finds the BRIDGEplate,
+identifies the plate stack, selects channels from a setup file saved by the GUI (or every channel
+with --all) and logs them in the same layout StartLog() writes. Tk and Pmw are never imported.
+Several BRIDGEplates are logged into one file, each read by its own acquisition thread on a shared
+sample grid. Progress is printed to stdout. Usage:
+    python loggerCLI.py --setup rig.stp --out run.csv
+    python loggerCLI.py --all --period 0.1 --count 0 --out run.plb --port /dev/ttyACM0
+    python loggerCLI.py --all --out rack.csv --port /dev/ttyACM0 --port /dev/ttyACM1
+"""
+
+import sys
+import time
+import signal
+import argparse
+
+import serial
+
+from loggerIO import find_ports_by_vid_pid, find_all_ports_by_vid_pid, find_port_by_serial, bridgeSerial
+from loggerIO import Bridge, AcqEngine, RowMerger, discoverPlates, describeStack, initPlates, plateReads, readPlates, plateOf, PLATES
+from loggerLOG import LogWriter, RateLog, Rotation, formatFor, CODECS, LAYOUTS, KEYFRAME_SECS, STAMP_COLUMNS, READ_TIME_DEADBAND
+
+VID="2E8A"
+PID="10E3"
+SETUP_PLATES=['DAQC','DAQC2','THERMO','CURRENT','ADC']      #plate order of a .stp file; DIGIplates are not saved in it
+
+
+def readSetup(path,stack):
+    """Parse a setup file saved by the GUI. Returns (channels, count, period) where
+    channels maps (plate, addr) to a list of (label, selected, every, deadband) in
+    plateReads() order, every being the sample periods between readings of the
+    channel and deadband the change needed before it is logged again.
+    Raises ValueError if the file was saved for a different plate stack."""
+    with open(path,'r') as f:
+        setupList=f.read().rstrip('\r\n').split(',')
+    k=0
+    for plate in SETUP_PLATES:
+        for i in range(8):
+            want=str(i) if i in stack[plate] else 'X'
+            if (setupList[k]!=want):
+                raise ValueError('Setup file does NOT match your hardware.')
+            k+=1
+    channels={}
+    for plate in SETUP_PLATES:
+        for i in stack[plate]:
+            n=len(plateReads(plate,i))
+            labels=setupList[k:k+n]
+            states=setupList[k+n:k+2*n]
+            channels[(plate,i)]=[(labels[c],states[c]=='1',1,0.0) for c in range(n)]
+            k+=2*n
+    dashes=[]       #(plate, addr, first channel, channels) of every dashboard; the ADCplate has two
+    for plate in SETUP_PLATES:
+        for i in stack[plate]:
+            if (plate=='ADC'):
+                dashes+=[(plate,i,0,12),(plate,i,12,8)]
+            else:
+                dashes.append((plate,i,0,len(channels[(plate,i)])))
+    #the rate of each dashboard follows the period, then its deadband; older files have neither
+    rates=setupList[k+2:k+2+len(dashes)]
+    bands=setupList[k+2+len(dashes):k+2+2*len(dashes)]
+    for d in range(len(dashes)):
+        plate,i,first,width=dashes[d]
+        every=max(1,setupNumber(rates,d,int,1))
+        band=abs(setupNumber(bands,d,float,0.0))
+        chans=channels[(plate,i)]
+        for c in range(first,first+width):
+            chans[c]=(chans[c][0],chans[c][1],every,band)
+    return channels,int(setupList[k]),float(setupList[k+1])
+
+def setupNumber(vals,d,conv,default):
+    try:
+        return conv(vals[d])
+    except (IndexError,ValueError):
+        return default
+
+def selectReads(stack,channels,scale='c',rates=(),bands=()):
+    """Every selected channel in log column order as (column name, command, converter, bulk,
+    every, deadband). channels is the result of readSetup(), or None to select every channel.
+    rates and bands are lists of (column name prefix, value) that override the rate and
+    the deadband of matching channels."""
+    reads=[]
+    for plate in PLATES:
+        for i in stack[plate]:
+            chans=plateReads(plate,i,scale)
+            for c in range(len(chans)):
+                label,cmd,conv,bulk=chans[c]
+                every,band=1,0.0
+                if (channels!=None):
+                    if ((plate,i) not in channels):
+                        continue
+                    label,selected,every,band=channels[(plate,i)][c]
+                    if (not selected):
+                        continue
+                name=plate+'-'+str(i)+'-'+label
+                for prefix,n in rates:
+                    if (name.startswith(prefix)):
+                        every=n
+                for prefix,x in bands:
+                    if (name.startswith(prefix)):
+                        band=x
+                reads.append((name,cmd,conv,bulk,every,band))
+    return reads
+
+def openPort(port):
+    """Open the BRIDGEplate on port, or the one found by its USB id if port is None.
+    Returns None if there is none."""
+    if (port==None):
+        port=find_ports_by_vid_pid(VID,PID)
+    if (not port):
+        return None
+    ser=serial.Serial(port,115200,timeout=20)
+    ser.flush()
+    ser.reset_input_buffer()
+    return ser
+
+def reopenBy(key,port):
+    """Reconnect callback for a Bridge: look the BRIDGEplate up by its USB serial
+    number first so it is found again if it comes back on another port."""
+    def reopen():
+        return openPort(find_port_by_serial(key) or port)
+    return reopen
+
+def parseOverrides(specs,conv,least,option):
+    """Options of the form PREFIX=VALUE as (prefix, conv(VALUE)). Raises ValueError
+    naming option if one is malformed or its value is below least."""
+    out=[]
+    for spec in specs:
+        prefix,sep,val=spec.rpartition('=')
+        try:
+            val=conv(val)
+        except ValueError:
+            val=None
+        if (not sep or val==None or val<least):
+            raise ValueError('bad '+option+' '+spec)
+        out.append((prefix,val))
+    return out
+
+def ownOverrides(overrides,key):
+    """The overrides that apply to the bridge key, with its key: prefix removed"""
+    return [(p[len(key)+1:] if p.startswith(key+':') else p,v) for p,v in overrides]
+
+def assignSetups(specs,keys):
+    """Map each bridge key to a setup file. specs are FILE or KEY=FILE; plain files
+    go to the bridges without a keyed file, in order. Raises ValueError on an unknown key."""
+    setups={}
+    plain=[]
+    for spec in specs:
+        key,sep,path=spec.rpartition('=')
+        if (sep and key in keys):
+            setups[key]=path
+        elif (sep and len(key)>0 and len(keys)>1):
+            raise ValueError('No BRIDGEplate '+key)
+        else:
+            plain.append(spec)
+    for key in keys:
+        if (key not in setups and len(plain)>0):
+            setups[key]=plain.pop(0)
+    return setups
+
+def main():
+    parser=argparse.ArgumentParser(description='Headless Pi-Plates Data Logger')
+    parser.add_argument('--port',action='append',help='serial port of a BRIDGEplate, repeat for several (default: every one found by USB id)')
+    parser.add_argument('--setup',action='append',help='setup file (.stp) saved by the GUI selecting the channels to log; '
+                        'with several BRIDGEplates repeat it, as FILE in --port order or as SERIAL=FILE')
+    parser.add_argument('--all',action='store_true',help='log every channel of every plate found')
+    parser.add_argument('--out',required=True,help='log file; .plb selects the binary format, anything else CSV')
+    parser.add_argument('--period',type=float,help='sample period in seconds (default: from the setup file, else 1.0)')
+    parser.add_argument('--count',type=int,help='samples to log, 0 = until stopped (default: from the setup file, else 0)')
+    parser.add_argument('--scale',default='c',choices=['c','f','k'],help='THERMOplate temperature scale')
+    parser.add_argument('--every',action='append',default=[],help='sample the channels whose column name starts with PREFIX '
+                        'only every N sample periods, as PREFIX=N (e.g. THERMO-1=10); repeat for more')
+    parser.add_argument('--layout',default='dense',choices=LAYOUTS,help='log layout when channels are sampled at different rates')
+    parser.add_argument('--changes',action='store_true',help='log a value only when it moves by more than its deadband')
+    parser.add_argument('--deadband',action='append',default=[],help='deadband of the channels whose column name starts with PREFIX, '
+                        'as PREFIX=X (e.g. DAQC2-0-A=0.01); repeat for more (default: 0, any change)')
+    parser.add_argument('--keyframe-secs',type=float,default=KEYFRAME_SECS,help='with --changes, write a full row every N seconds (0 = only at the start)')
+    parser.add_argument('--stamps',default='local',choices=list(STAMP_COLUMNS.keys()),
+                        help='CSV timestamps: local time to the second, ISO 8601 UTC or epoch seconds, both to the microsecond '
+                             '(a --changes CSV log writes utc in place of local)')
+    parser.add_argument('--skew',action='store_true',help='add a column per plate with the seconds from the timestamp to its last reply')
+    parser.add_argument('--depth',type=int,default=16,help='commands sent to the BRIDGEplate ahead of their replies')
+    parser.add_argument('--lag',type=int,default=10,help='samples to wait for a slow BRIDGEplate before its part of a row is left blank')
+    parser.add_argument('--flush-rows',type=int,default=100,help='write the log to disk every N rows')
+    parser.add_argument('--flush-secs',type=float,default=1.0,help='...or every N seconds')
+    parser.add_argument('--fsync-secs',type=float,default=0.0,help='force the log onto disk every N seconds (0 = never)')
+    parser.add_argument('--segment-mb',type=float,default=0,help='start a new log segment every N MB (0 = off)')
+    parser.add_argument('--segment-mins',type=float,default=0,help='...or every N minutes (0 = off)')
+    parser.add_argument('--segment-at',default='off',choices=['off','hour','day'],help='...or at every clock hour or day')
+    parser.add_argument('--codec',default='none',choices=list(CODECS.keys()),help='compress the log')
+    parser.add_argument('--progress',type=float,default=5.0,help='seconds between progress lines (0 = quiet)')
+    args=parser.parse_args()
+    if (args.setup==None and not args.all):
+        parser.error('give a --setup file or --all')
+    try:
+        rates=parseOverrides(args.every,int,1,'--every')
+        bands=parseOverrides(args.deadband,float,0,'--deadband')
+    except ValueError as e:
+        parser.error(str(e))
+
+    t0=time.monotonic()
+    ports=args.port or find_all_ports_by_vid_pid(VID,PID)
+    if (len(ports)==0):
+        print("No COM port found with attached BRDGEplate.")
+        sys.exit(1)
+    bridges=[]
+    for port in ports:
+        ser=openPort(port)
+        key=bridgeSerial(ser.port)
+        bridge=Bridge(ser,args.depth,reopen=reopenBy(key,ser.port))
+        stack=discoverPlates(bridge)
+        bridge.onReconnect=lambda bridge=bridge,stack=stack: initPlates(bridge,stack)
+        bridges.append((key,bridge,stack))
+        print('BRIDGEplate '+key+' on '+str(ser.port)+': '+describeStack(stack)
+              +' ('+str(round(time.monotonic()-t0,2))+' s)')
+
+    count,period=0,1.0
+    setups={}
+    if (args.setup):
+        try:
+            setups=assignSetups(args.setup,[key for key,bridge,stack in bridges])
+        except ValueError as e:
+            print('Load Setup: '+str(e))
+            sys.exit(1)
+    parts=[]
+    for key,bridge,stack in bridges:
+        channels=None
+        if (key in setups):
+            try:
+                channels,count,period=readSetup(setups[key],stack)
+            except (OSError,ValueError,IndexError) as e:
+                print('Load Setup ('+key+'): '+str(e))
+                sys.exit(1)
+        elif (not args.all):
+            continue            #no setup file for this bridge
+        if (args.all):
+            channels=None
+        reads=selectReads(stack,channels,args.scale,ownOverrides(rates,key),ownOverrides(bands,key))
+        if (len(reads)>0):
+            parts.append((key,bridge,reads))
+    if (args.period!=None):
+        period=args.period
+    if (args.count!=None):
+        count=args.count
+    if (len(parts)==0):
+        print('No channels selected')
+        sys.exit(1)
+
+    #one BRIDGEplate keeps the single bridge layout; with several, columns are prefixed by the bridge
+    names=[]
+    types=[]
+    every=[]
+    deadband=[]
+    for key,bridge,reads in parts:
+        prefix=key+':' if len(bridges)>1 else ''
+        names+=[prefix+name for name,cmd,conv,bulk,n,band in reads]
+        types+=['i1' if conv==int else 'f8' for name,cmd,conv,bulk,n,band in reads]
+        every+=[n for name,cmd,conv,bulk,n,band in reads]
+        deadband+=[band for name,cmd,conv,bulk,n,band in reads]
+        if (args.skew):     #the engine appends one read time per plate after the bridge's channels
+            for plate in readPlates([cmd for name,cmd,conv,bulk,n,band in reads]):
+                name=plate+'-Read Time'
+                names.append(prefix+name)
+                types.append('f8')
+                every.append(min(n for rname,cmd,conv,bulk,n,band in reads if plateOf(cmd)==plate))
+                deadband.append(READ_TIME_DEADBAND)
+                for p,x in ownOverrides(bands,key):
+                    if (name.startswith(p)):
+                        deadband[-1]=x
+    if (not args.changes):
+        deadband=None
+    rotation=Rotation(int(args.segment_mb*1000000),args.segment_mins*60,args.segment_at)
+    if (max(every)>1):
+        logFile=RateLog(args.out,names,types,every,args.layout,args.flush_rows,args.flush_secs,args.fsync_secs,
+                        deadband=deadband,keyframeSecs=args.keyframe_secs,stamps=args.stamps,
+                        rotation=rotation,codec=CODECS[args.codec])
+    else:
+        fmt=formatFor(args.out,names,types,deadband,args.keyframe_secs,args.stamps)
+        logFile=LogWriter(args.out,fmt,args.flush_rows,args.flush_secs,args.fsync_secs,rotation=rotation,codec=CODECS[args.codec])
+
+    stop=[False]
+    def halt(signum,frame):
+        stop[0]=True
+    signal.signal(signal.SIGINT,halt)
+    signal.signal(signal.SIGTERM,halt)
+
+    #every bridge gets its own engine; all of them sample on one grid so their rows can be joined
+    engines=[]
+    for key,bridge,reads in parts:
+        engine=AcqEngine(bridge,period)
+        engine.setPlan([(cmd,conv,bulk) for name,cmd,conv,bulk,n,band in reads],[n for name,cmd,conv,bulk,n,band in reads],args.skew)
+        engine.calibrateNow()
+        engines.append(engine)
+    fastest=max(engine.minPeriod for engine in engines)
+    if (fastest>period):
+        period=fastest
+        print('Sample period raised to the measured minimum of '+str(period)+' s')
+    epoch=time.monotonic()+0.1
+    merger=RowMerger(engines,[engine.width for engine in engines],period,epoch,args.lag)
+    for engine in engines:
+        engine.epoch=epoch
+        engine.setPeriod(period)
+        engine.start()
+    print('Logging '+str(len(names))+' channels on '+str(len(parts))+' BRIDGEplate(s) every '+str(period)+' s to '+args.out
+          +(' until stopped' if count<=0 else ' for '+str(count)+' samples'))
+    samples=0
+    nextReport=time.monotonic()+args.progress
+    while (not stop[0]):
+        time.sleep(0.02)
+        fastest=max(engine.minPeriod for engine in engines)
+        if (fastest>period):
+            period=fastest
+            merger.setPeriod(period)
+            for engine in engines:
+                engine.setPeriod(period)
+            print('Sample period raised to the measured minimum of '+str(period)+' s')
+        for stamp,vals in merger.drain():
+            logFile.write(stamp,vals)
+            samples+=1
+            if (count>0 and samples>=count):
+                stop[0]=True
+                break
+        if (logFile.error):
+            print('Writing the log file failed: '+str(logFile.error))
+            break
+        if (args.progress>0 and time.monotonic()>=nextReport):
+            nextReport+=args.progress
+            lost=[key for key,bridge,reads in parts if bridge.lost]
+            print(str(samples)+' samples, '+str(sum(engine.stats()[2] for engine in engines))+' skipped, '
+                  +str(sum(bridge.failed for key,bridge,reads in parts))+' failed reads, '
+                  +str(logFile.depth())+' rows waiting for disk'
+                  +(', segment '+str(len(logFile.segments)) if len(logFile.segments)>1 else '')
+                  +(', BRIDGEplate '+' '.join(lost)+' lost, reconnecting' if lost else ''))
+            sys.stdout.flush()
+    for engine in engines:
+        engine.stop()
+    for engine in engines:
+        engine.join(2)
+    logFile.close()
+    print("Logging stopped: "+str(samples)+" samples"+(", "+str(merger.late)+" late rows dropped" if merger.late else ""))
+    for k in range(len(parts)):
+        key,bridge,reads=parts[k]
+        ticks,overruns,skipped,jitter,meanJitter,maxJitter=engines[k].stats()
+        print("BRIDGEplate "+key+": "+str(overruns)+" overruns, "+str(skipped)+" skipped samples, jitter mean/max "
+              +str(round(meanJitter*1000,3))+"/"+str(round(maxJitter*1000,3))+" ms, "
+              +str(bridge.misses)+" missed replies, "+str(bridge.failed)+" failed reads, "+str(bridge.reconnects)+" reconnects")
+    print("Log writer: "+str(logFile.written)+" rows in "+str(logFile.batches)+" writes")
+    for key,bridge,stack in bridges:
+        bridge.close()
+    sys.exit(1 if logFile.error else 0)
+
+if __name__ == '__main__':
+    main()
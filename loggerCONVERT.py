@@ -0,0 +1,73 @@
+"""
+File: loggerCONVERT.py
+Description: Converts a PIPLATElogger binary log (.plb or compressed .plb.gz) into the CSV layout
+the logger writes. A change-driven log (CSV or binary) is expanded back into full rows, and with
+--period into one row per sample period. The log is streamed, so files of any size convert in
+constant memory. Usage:
+    python loggerCONVERT.py run.plb [run.csv]
+    python loggerCONVERT.py --period 0.5 changes.csv dense.csv
+"""
+
+import io
+import os
+import sys
+import argparse
+
+from loggerLOG import BinaryReader, ChangeReader, CsvFormat, codecFor, fillGrid, BIN_MAGIC, STAMP_COLUMNS
+
+
+def convert(src,dst,period=None,stamps=None):
+    """Stream binary or change-driven CSV log file object src (binary mode) into CSV file
+    object dst (binary mode), filling in one row every period seconds if period is given.
+    stamps is the timestamp style to write (default: that of a CSV log, else local).
+    Returns the row count. Raises ValueError if period is shorter than a second
+    and the log's stamps are local ones, which only hold whole seconds."""
+    if (src.peek(len(BIN_MAGIC))[:len(BIN_MAGIC)]==BIN_MAGIC):
+        reader=BinaryReader(src)
+        header=reader.header['csv_header']
+    else:
+        reader=ChangeReader(io.TextIOWrapper(src,encoding='utf-8',newline=''))
+        header=','.join(['Date/Time']+reader.names)
+        if (period and period<1.0 and reader.stamps=='local'):
+            raise ValueError('the log has local timestamps to the second, which can not be filled in every '+str(period)+' seconds')
+        stamps=stamps or reader.stamps
+    fmt=CsvFormat(header,stamps or 'local')
+    dst.write(fmt.header())
+    rows=0
+    if (period):
+        reader=fillGrid(reader,period)
+    for stamp,vals in reader:
+        if (all(v==None for v in vals) and len(vals)>0):
+            vals=None
+        else:
+            vals=['' if v==None else v for v in vals]
+        dst.write(fmt.row(stamp,vals))
+        rows+=1
+    return rows
+
+def main():
+    parser=argparse.ArgumentParser(description='Convert a PIPLATElogger binary or change-driven log to CSV')
+    parser.add_argument('log',help='binary log file (.plb or .plb.gz) or change-driven CSV log')
+    parser.add_argument('--period',type=float,help='write one row every PERIOD seconds, holding each value until it changes')
+    parser.add_argument('--stamps',choices=list(STAMP_COLUMNS.keys()),help='timestamp style (default: as in the log, local for binary logs)')
+    parser.add_argument('csv',nargs='?',help='CSV file to write (default: same name with .csv, - for stdout)')
+    args=parser.parse_args()
+    codec=codecFor(args.log)
+    out=args.csv or os.path.splitext(args.log[:len(args.log)-len(codec.ext)])[0]+'.csv'
+    if (os.path.abspath(out)==os.path.abspath(args.log)):
+        out=os.path.splitext(out)[0]+'-dense.csv'
+    with codec.reader(args.log) as src:
+        try:
+            if (out=='-'):
+                rows=convert(src,sys.stdout.buffer,args.period,args.stamps)
+            else:
+                with open(out,'wb') as dst:
+                    rows=convert(src,dst,args.period,args.stamps)
+                print(str(rows)+' rows written to '+out)
+        except ValueError as e:
+            if (out!='-' and os.path.getsize(out)==0):
+                os.remove(out)
+            parser.error(str(e))
+
+if __name__ == '__main__':
+    main()
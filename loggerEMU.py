@@ -0,0 +1,179 @@
+"""
+File: loggerEMU.py
+Description: BRIDGEplate emulator for testing and benchmarking PIPLATElogger without hardware.
+Opens a pseudo-terminal and answers the same text protocol CMD() speaks to a real bridge.
+Runs on Linux/macOS only (uses pty). Usage:
+    python loggerEMU.py --daqc2 0 1 --thermo 0 --latency 0.002
+    python PIPLATElogger-PC.py --port /dev/pts/N
+"""
+
+import os
+import re
+import sys
+import tty
+import math
+import time
+import argparse
+import threading
+
+PLATES=['DAQC2','DAQC','THERMO','CURRENT','DIGI','ADC']
+CMDre=re.compile(r'^\s*(\w+)\.(\w+)\((.*)\)\s*$')
+
+
+class Emulator:
+    """Answers BRIDGEplate commands for a simulated plate stack.
+    stack maps a plate type (see PLATES) to the list of addresses present.
+    latency is the delay before every reply in seconds and cmdLatency maps a
+    command name such as 'THERMO.getTEMP' to its own delay."""
+    def __init__(self,stack,latency=0.0,cmdLatency=None):
+        self.stack={}
+        for p in PLATES:
+            self.stack[p]=set(stack.get(p,[]))
+        self.latency=latency
+        self.cmdLatency=dict(cmdLatency or {})
+        self.t0=time.monotonic()
+        self.count=0
+
+    def wave(self,addr,chan,period,lo,hi):
+        """A slow sine per channel so every trace on the GUI looks different"""
+        t=time.monotonic()-self.t0
+        ph=2*math.pi*(t/(period*(1+0.1*chan))+addr*0.7+chan*0.4)
+        return lo+(hi-lo)*(0.5+0.5*math.sin(ph))
+
+    def bit(self,addr,chan):
+        t=time.monotonic()-self.t0
+        return int(t/(0.5*(chan+1)+addr*0.1))%2
+
+    def delay(self,name):
+        d=self.cmdLatency.get(name,self.latency)
+        if (d>0):
+            time.sleep(d)
+
+    def reply(self,line):
+        """Return the reply text (without line ending) for one command line"""
+        self.count+=1
+        m=CMDre.match(line)
+        if (m==None):
+            return 'ERROR'
+        plate,fn,args=m.group(1),m.group(2),m.group(3)
+        args=[a.strip().strip('"\'') for a in args.split(',') if a.strip()!='']
+        self.delay(plate+'.'+fn)
+        if (plate not in self.stack or len(args)==0 or not args[0].isdigit()):
+            return 'ERROR'
+        addr=int(args[0])
+        if (fn=='getADDR'):
+            return str(addr) if addr in self.stack[plate] else 'None'
+        if (addr not in self.stack[plate]):
+            return 'ERROR'
+        if (fn in ('initADC','setMODE')):
+            return 'OK'
+        if (fn=='getADC'):
+            return self.adc(plate,addr,int(args[1]))
+        if (fn=='getADCall'):
+            n=16 if plate=='ADC' else 8
+            return '['+', '.join(self.adc(plate,addr,k) for k in range(n))+']'
+        if (fn=='getDINbit'):
+            return str(self.bit(addr,int(args[1])))
+        if (fn=='getDINall'):
+            n=4 if plate=='ADC' else 8
+            first=1 if plate=='DIGI' else 0
+            return str(sum(self.bit(addr,k+first)<<k for k in range(n)))
+        if (fn=='getTEMP'):
+            c=self.wave(addr,int(args[1]),20.0,15.0,35.0)
+            scale=args[2].lower() if len(args)>2 else 'c'
+            if (scale=='f'):
+                c=c*9/5+32
+            elif (scale=='k'):
+                c=c+273.15
+            return str(round(c,3))
+        if (fn=='getI'):
+            return str(round(self.wave(addr,int(args[1]),8.0,4.0,20.0),3))
+        return 'ERROR'
+
+    def adc(self,plate,addr,chan):
+        if (plate=='DAQC'):
+            return str(round(self.wave(addr,chan,5.0,0.0,4.096),3))
+        return str(round(self.wave(addr,chan,5.0,-10.0,10.0),4))
+
+
+class PtyServer(threading.Thread):
+    """Serves an Emulator on a pseudo-terminal. port is the device name to hand
+    to serial.Serial() or to PIPLATElogger --port."""
+    def __init__(self,emu):
+        threading.Thread.__init__(self,name='BRIDGEemu',daemon=True)
+        self.emu=emu
+        self.master,self.slave=os.openpty()
+        tty.setraw(self.slave)          #no echo and no CR/LF translation
+        self.port=os.ttyname(self.slave)
+
+    def run(self):
+        pending=b''
+        while True:
+            try:
+                data=os.read(self.master,4096)
+            except OSError:
+                return
+            if (not data):
+                return
+            pending+=data
+            while (b'\n' in pending):
+                line,pending=pending.split(b'\n',1)
+                resp=self.emu.reply(str(line,'utf-8','replace').replace('\r',''))
+                try:
+                    os.write(self.master,(resp+'\r\n').encode('utf-8'))
+                except OSError:
+                    return      #closed while answering
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def stackFromArgs(args):
+    stack={}
+    for p in PLATES:
+        addrs=getattr(args,p.lower())
+        if (addrs):
+            stack[p]=addrs
+    return stack
+
+def addStackArgs(parser):
+    """Plate stack options shared with the benchmark and headless tools"""
+    for p in PLATES:
+        parser.add_argument('--'+p.lower(),type=int,nargs='*',default=[],metavar='ADDR',
+                            help='addresses of emulated '+p+'plates')
+    parser.add_argument('--latency',type=float,default=0.0,help='delay before every reply in seconds')
+    parser.add_argument('--cmd-latency',action='append',default=[],metavar='NAME=SEC',
+                        help='delay for one command, e.g. THERMO.getTEMP=0.1')
+
+def emulatorFromArgs(args):
+    cmdLatency={}
+    for item in args.cmd_latency:
+        name,sec=item.split('=')
+        cmdLatency[name]=float(sec)
+    stack=stackFromArgs(args)
+    if (len(stack)==0):
+        stack={'DAQC2':[0]}
+    return Emulator(stack,args.latency,cmdLatency)
+
+def main():
+    parser=argparse.ArgumentParser(description='BRIDGEplate emulator on a pseudo-terminal')
+    addStackArgs(parser)
+    args=parser.parse_args()
+    emu=emulatorFromArgs(args)
+    server=PtyServer(emu)
+    server.start()
+    print('BRIDGEplate emulator listening on '+server.port)
+    for p in PLATES:
+        if (emu.stack[p]):
+            print('  '+p+' at '+','.join(str(a) for a in sorted(emu.stack[p])))
+    sys.stdout.flush()
+    try:
+        while (server.is_alive()):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    print(str(emu.count)+' commands answered')
+
+if __name__ == '__main__':
+    main()
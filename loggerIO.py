@@ -0,0 +1,819 @@
+"""
+File: loggerIO.py
+Description: BRIDGEplate serial transport and acquisition engine for PIPLATElogger.
+This module never touches Tk so that it can run on its own thread.
+Dependent on package pyserial
+"""
+
+import os
+import re
+import json
+import math
+import time
+import queue
+import threading
+
+import serial
+import serial.tools.list_ports
+
+from loggerROW import NOT_DUE
+
+
+def extract_vid_pid_from_hwid(hwid):
+    """Extract VID and PID from hardware ID string"""
+    if not hwid:
+        return None, None
+    # Look for VID pattern
+    vid_match = re.search(r'VID_([0-9A-Fa-f]{4})', hwid)
+    vid = vid_match.group(1).upper() if vid_match else None
+    # Look for PID pattern
+    pid_match = re.search(r'PID_([0-9A-Fa-f]{4})', hwid)
+    pid = pid_match.group(1).upper() if pid_match else None
+    return vid, pid
+
+def find_ports_by_vid_pid(target_vid, target_pid):
+    """Find the COM port of a device by VID and PID combination. With several
+    matching devices this is the last one listed; see find_all_ports_by_vid_pid()."""
+    matching_ports = find_all_ports_by_vid_pid(target_vid, target_pid)
+    if matching_ports:
+        return matching_ports[-1]
+    return matching_ports
+
+def find_all_ports_by_vid_pid(target_vid, target_pid):
+    """Find every COM port by VID and PID combination"""
+    matching_ports = []
+
+    try:
+        available_ports = serial.tools.list_ports.comports()
+        for port in available_ports:
+            vid = None
+            pid = None
+            # Try to get VID/PID directly from pyserial
+            if hasattr(port, 'vid') and port.vid is not None:
+                vid = f"{port.vid:04X}"
+            if hasattr(port, 'pid') and port.pid is not None:
+                pid = f"{port.pid:04X}"
+            # If not available directly, parse from hardware ID
+            if not vid or not pid:
+                if port.hwid:
+                    parsed_vid, parsed_pid = extract_vid_pid_from_hwid(port.hwid)
+                    if parsed_vid and not vid:
+                        vid = parsed_vid
+                    if parsed_pid and not pid:
+                        pid = parsed_pid
+
+            # Check if this port matches the target VID/PID
+            if vid == target_vid.upper() and pid == target_pid.upper():
+                matching_ports.append(port.device)
+    except Exception as e:
+        print(f"Error searching COM ports: {e}")
+    return matching_ports
+
+
+PLATES=['DAQC2','DAQC','THERMO','CURRENT','ADC','DIGI']     #in log column order
+
+
+CMD_DEADLINE=0.5        #seconds to wait for the reply to one command
+DEADLINES={'THERMO.getTEMP':1.0,'ADC.initADC':5.0}     #commands that are known to answer more slowly
+CMD_RETRIES=2           #times a command whose reply never came is sent again
+BATCH_RECOVERY=1.0      #seconds a batch may run past its first missed reply before it gives up
+RECONNECT_SECS=2.0      #pause between attempts to reopen a lost port
+
+class Bridge:
+    """Serial link to a BRIDGEplate. Every command goes through CMD() or batch() under
+    a lock so the acquisition thread and the GUI can never interleave on the port.
+    depth is the number of commands batch() keeps in flight ahead of their replies.
+    Each reply must arrive within its deadline (see DEADLINES); a command that misses
+    it is retried up to retries times and then reported as None. The bridge answers
+    every command once and in order, so the replies still owed for missed commands
+    are counted and discarded when they arrive instead of being taken as the answers
+    to later commands. If the port fails
+    (e.g. the USB cable is pulled) every command returns None at once and, when a
+    reopen function is given, a background thread calls it until it returns a new
+    open port. onReconnect, if set, is called after each successful reconnect."""
+    def __init__(self,ser,depth=16,deadline=CMD_DEADLINE,retries=CMD_RETRIES,reopen=None):
+        self.ser=ser
+        self.depth=max(1,depth)
+        self.deadline=deadline
+        self.retries=retries
+        self.reopen=reopen
+        self.onReconnect=None
+        self.lock=threading.Lock()
+        self.lost=False
+        self.closed=False
+        self.misses=0           #replies that did not arrive in time
+        self.failed=0           #commands given up on after their retries
+        self.reconnects=0
+        self.owed=0             #late replies still to come for commands already given up on
+        self.heard=0.0          #monotonic time of the last reply or write on the port
+        self.silence=max([deadline]+list(DEADLINES.values()))  #silence after which no reply is on its way
+
+    def CMD(self,cmd):
+        """Send one command and return its reply, or None if it never came"""
+        return self.batch([cmd])[0]
+
+    def batch(self,cmds,timeout=None,retries=None,times=None):
+        """Send a list of commands and return their replies in the same order.
+        Up to depth commands are written in a single transfer; the window is
+        topped up once half of it has been answered, so the bridge always has
+        work queued instead of waiting a full USB round trip per command.
+        timeout overrides the deadline of every command in the batch and retries
+        the number of retries. A missed command is sent again at the end of the
+        batch while the commands behind it carry on; the bridge answers in order, so
+        its late reply is still known by its place and used if it comes first. Once
+        BATCH_RECOVERY has passed since the first miss the commands still unanswered
+        are reported as None and their replies are discarded when they arrive. While
+        replies owed from an earlier batch are still to come no command is sent.
+        If times is a list, the monotonic time each reply arrived is stored in it."""
+        n=len(cmds)
+        resp=[None]*n
+        if (retries==None):
+            retries=self.retries
+        tries=[0]*n
+        with self.lock:
+            if (self.lost):
+                return resp
+            saved=self.ser.timeout
+            try:
+                if (self.owed>0 and not self.settle(time.monotonic()+BATCH_RECOVERY)):
+                    self.failed+=n
+                    self.ser.timeout=saved
+                    return resp
+                order=list(range(n))        #commands in the order they are sent, retries appended
+                head=0                      #next entry of order whose reply is expected
+                sent=0
+                late=[]                     #commands that missed their deadline, in the order they were sent
+                end=None                    #set by the first miss
+                while (head<len(order)):
+                    if (sent-head<=self.depth//2 and sent<len(order)):
+                        top=min(len(order),head+self.depth)
+                        self.ser.write(''.join(cmds[i]+'\n' for i in order[sent:top]).encode('utf-8'))
+                        self.heard=time.monotonic()
+                        sent=top
+                    now=time.monotonic()
+                    if (end!=None and now>=end):
+                        self.owed+=len(late)+sent-head      #still in flight; the next batch waits for them
+                        break
+                    if (self.owed>0 or len(late)>0):
+                        wait=end-now                #a late reply comes first; wait for it as long as the batch may
+                    else:
+                        wait=self.limit(cmds[order[head]],timeout)
+                        if (end!=None):
+                            wait=min(wait,end-now)
+                    wait=max(0.0,wait)
+                    if (self.ser.timeout!=wait):
+                        self.ser.timeout=wait       #reconfigures the port, so only when it changes
+                    xresp=self.ser.read_until()
+                    if (xresp.endswith(b'\n')):
+                        self.heard=time.monotonic()
+                        if (self.owed>0):
+                            self.owed-=1            #late reply to a command of an earlier batch
+                            continue
+                        if (len(late)>0):
+                            k=late.pop(0)
+                        else:
+                            k=order[head]
+                            head+=1
+                        if (resp[k]==None):         #else the reply to a retry of a command already answered
+                            resp[k]=str(xresp,'utf-8','replace').replace("\r", "").replace("\n", "")
+                            if (times!=None):
+                                times[k]=self.heard
+                        continue
+                    now=time.monotonic()
+                    if (self.owed>0 or len(late)>0 or (end!=None and now>=end)):
+                        continue                    #the top of the loop gives up on the batch
+                    k=order[head]
+                    head+=1
+                    self.misses+=1
+                    late.append(k)
+                    if (end==None):
+                        end=now+BATCH_RECOVERY
+                    if (tries[k]<retries and now+self.limit(cmds[k],timeout)<end):
+                        tries[k]+=1
+                        order.append(k)
+                self.failed+=resp.count(None)
+                self.ser.timeout=saved
+            except (serial.SerialException, OSError) as e:
+                self.lose(e)
+        return resp
+
+    def limit(self,cmd,timeout=None):
+        """Deadline in seconds for the reply to cmd"""
+        return timeout if timeout!=None else DEADLINES.get(cmd.split('(')[0],self.deadline)
+
+    def settle(self,until):
+        """Discard the late replies owed from an earlier batch before new commands go
+        out. Returns False if they have not all arrived by monotonic time until. The
+        bridge answers one command at a time, so once the port has been silent for
+        longer than the slowest command can take (self.silence) nothing more is on
+        its way and the replies still counted were lost."""
+        while (self.owed>0):
+            now=time.monotonic()
+            if (now-self.heard>=self.silence):
+                self.owed=0
+                break
+            wait=min(until,self.heard+self.silence)-now
+            if (wait<=0):
+                return False
+            self.ser.timeout=wait
+            if (self.ser.read_until().endswith(b'\n')):
+                self.heard=time.monotonic()
+                self.owed-=1
+        return True
+
+    def lose(self,e):
+        """Mark the port as lost (called with the lock held) and start reconnecting"""
+        print(f"BRIDGEplate connection lost: {e}")
+        self.lost=True
+        try:
+            self.ser.close()
+        except (serial.SerialException, OSError):
+            pass
+        if (self.reopen and not self.closed):
+            threading.Thread(target=self.reconnect,name='BridgeReconnect',daemon=True).start()
+
+    def reconnect(self):
+        while (not self.closed):
+            time.sleep(RECONNECT_SECS)
+            try:
+                ser=self.reopen()
+            except (serial.SerialException, OSError):
+                ser=None
+            if (ser):
+                with self.lock:
+                    self.ser=ser
+                    self.lost=False
+                    self.owed=0
+                    self.reconnects+=1
+                print("BRIDGEplate reconnected on "+str(ser.port))
+                if (self.onReconnect):
+                    self.onReconnect()
+                return
+
+    def setDepth(self,depth):
+        with self.lock:
+            self.depth=max(1,depth)
+
+    def close(self):
+        self.closed=True
+        with self.lock:
+            self.ser.close()
+
+
+PROBE_TIMEOUT=0.5       #seconds to wait for a getADDR reply before the address is taken as empty
+
+def discoverPlates(bridge,init=True,times=None,strict=False):
+    """Probe all eight addresses of every plate type. Returns a dict mapping the
+    plate type to the list of addresses found. ADCplates are initialised the same
+    way the GUI does it unless init is False. All probes are pipelined in one
+    batch with a PROBE_TIMEOUT read timeout. If times is a dict the seconds spent
+    probing and initialising are stored in it as 'probe' and 'init'. An address
+    that does not answer is taken as empty unless strict is set, in which case
+    None is returned because the stack is not known."""
+    t0=time.monotonic()
+    probes=[(plate,i) for plate in PLATES for i in range(8)]
+    resp=bridge.batch([plate+".getADDR("+str(i)+")" for plate,i in probes],PROBE_TIMEOUT,0)
+    if (strict and None in resp):
+        return None
+    stack={}
+    for plate in PLATES:
+        stack[plate]=[]
+    for k in range(len(probes)):
+        plate,i=probes[k]
+        if (resp[k]!=None and resp[k][:1]==str(i)):
+            stack[plate].append(i)
+    t1=time.monotonic()
+    if (init):
+        initPlates(bridge,stack)
+    if (times!=None):
+        times['probe']=t1-t0
+        times['init']=time.monotonic()-t1
+    return stack
+
+def describeStack(stack):
+    """e.g. 'DAQC2 0,1, THERMO 3' for printing"""
+    return ', '.join(p+' '+','.join(str(a) for a in stack[p]) for p in PLATES if stack[p]) or 'no plates'
+
+def initPlates(bridge,stack):
+    """Put the ADCplates of a stack into the mode the logger samples them in"""
+    cmds=[]
+    for i in stack['ADC']:
+        cmds+=["ADC.initADC("+str(i)+")","ADC.setMODE("+str(i)+",slow)"]
+    if (cmds):
+        bridge.batch(cmds)
+
+
+TOPOLOGY_FILE=os.path.join(os.path.expanduser('~'),'.piplatelogger-topology.json')
+
+def bridgeSerial(port):
+    """USB serial number of the BRIDGEplate on port, or the port name if it has none (e.g. the emulator)"""
+    try:
+        for p in serial.tools.list_ports.comports():
+            if (p.device==port and p.serial_number):
+                return p.serial_number
+    except Exception as e:
+        print(f"Error reading COM port details: {e}")
+    return str(port)
+
+def find_port_by_serial(serial_number):
+    """The COM port of the USB device with this serial number, or None"""
+    try:
+        for p in serial.tools.list_ports.comports():
+            if (p.serial_number==serial_number):
+                return p.device
+    except Exception as e:
+        print(f"Error searching COM ports: {e}")
+    return None
+
+def loadTopology(key,path=TOPOLOGY_FILE):
+    """The plate stack cached for bridge key, or None if there is none"""
+    try:
+        with open(path,'r') as f:
+            entry=json.load(f).get(key)
+        if (entry==None):
+            return None
+        return {plate:list(entry['stack'].get(plate,[])) for plate in PLATES}
+    except (OSError,ValueError,KeyError,AttributeError):
+        return None
+
+def saveTopology(key,port,stack,path=TOPOLOGY_FILE):
+    """Cache the plate stack found behind bridge key"""
+    try:
+        with open(path,'r') as f:
+            cache=json.load(f)
+    except (OSError,ValueError):
+        cache={}
+    cache[key]={'port':str(port),'stack':stack,'saved':time.strftime('%Y-%m-%d %H:%M:%S')}
+    try:
+        with open(path+'.tmp','w') as f:
+            json.dump(cache,f,indent=1)
+        os.replace(path+'.tmp',path)
+    except OSError as e:
+        print(f"Could not save the plate topology cache: {e}")
+
+
+class TopologyCheck(threading.Thread):
+    """Probes the plate stack in the background and compares it with the cached
+    stack the GUI was built from. When done is set, found holds the probed stack
+    (None if probing failed or any probe went unanswered, e.g. because the bridge
+    was lost); a stack that changed is written back to the cache."""
+    def __init__(self,bridge,key,port,stack):
+        threading.Thread.__init__(self,name='TopologyCheck',daemon=True)
+        self.bridge=bridge
+        self.key=key
+        self.port=port
+        self.stack=stack
+        self.found=None
+        self.done=threading.Event()
+
+    def mismatch(self):
+        return self.found!=None and self.found!=self.stack
+
+    def run(self):
+        try:
+            self.found=discoverPlates(self.bridge,False,strict=True)
+            if (self.found==None):
+                print("Topology check: not every probe was answered, keeping the cached plate stack")
+            elif (self.mismatch()):
+                saveTopology(self.key,self.port,self.found)
+        except (ValueError, serial.SerialException) as e:
+            print(f"Topology check error: {e}")
+        self.done.set()
+
+def plateReads(plate,addr,scale='c'):
+    """Every channel of one plate in log column order as (label, command, converter, bulk),
+    matching the channel rows the GUI builds for that plate"""
+    a=str(addr)
+    reads=[]
+    if (plate in ('DAQC2','DAQC')):
+        for k in range(8):
+            reads.append(("A Channel "+str(k)+":",plate+".getADC("+a+","+str(k)+")",float,(plate+".getADCall("+a+")",'list',k)))
+        for k in range(8):
+            reads.append(("D Channel "+str(k)+":",plate+".getDINbit("+a+","+str(k)+")",int,(plate+".getDINall("+a+")",'bit',k)))
+    elif (plate=='THERMO'):
+        for k in range(1,13):
+            reads.append(("T Channel "+str(k)+":",'THERMO.getTEMP('+a+','+str(k)+',"'+scale+'")',float,None))
+    elif (plate=='CURRENT'):
+        for k in range(1,9):
+            reads.append(("4-20mA "+str(k)+":","CURRENT.getI("+a+","+str(k)+")",float,None))
+    elif (plate=='ADC'):
+        for k in range(12):
+            label=("SE Channel "+str(k) if k<8 else "DE Channel "+str(k-8))+":"
+            reads.append((label,"ADC.getADC("+a+","+str(k)+")",float,("ADC.getADCall("+a+")",'list',k)))
+        for k in range(4):
+            reads.append(("D Channel "+str(k)+":","ADC.getDINbit("+a+","+str(k)+")",int,("ADC.getDINall("+a+")",'bit',k)))
+        for k in range(1,5):
+            reads.append(("4-20mA "+str(k)+":","ADC.getADC("+a+","+str(k)+")",float,("ADC.getADCall("+a+")",'list',k)))
+    elif (plate=='DIGI'):
+        for k in range(1,9):
+            reads.append(("D Channel "+str(k)+":","DIGI.getDINbit("+a+","+str(k)+")",int,("DIGI.getDINall("+a+")",'bit',k-1)))
+    return reads
+
+
+BULK_MIN=2      #selected channels on one plate before a whole-plate command replaces their single reads
+
+def plateOf(cmd):
+    """The plate a read command goes to, e.g. 'DAQC2-0' for DAQC2.getADC(0,3)"""
+    m=re.match(r'(\w+)\.\w+\((\d+)',cmd)
+    if (m==None):
+        return cmd
+    return m.group(1)+'-'+m.group(2)
+
+def readPlates(cmds):
+    """The plates of a list of read commands in order of first appearance. These are
+    the per-plate read time columns AcqEngine appends to its rows (see setPlan)."""
+    plates=[]
+    for cmd in cmds:
+        plate=plateOf(cmd)
+        if (plate not in plates):
+            plates.append(plate)
+    return plates
+
+def parseList(resp):
+    """Split a list reply such as '[1.25, 0.0, 3.3]' into its elements"""
+    return resp.strip('[]() ').replace(',',' ').split()
+
+def planReads(reads,bulkMin=BULK_MIN):
+    """Turn the selected channel reads into the commands for one tick.
+    reads is a list of (command, converter, bulk) where bulk is None or
+    (bulkCommand, kind, index): kind 'list' picks an element of a list reply
+    (getADCall) and 'bit' picks a bit of a bitmask reply (getDINall). When at
+    least bulkMin channels share a bulk command it is sent once in place of
+    their single reads. Returns (commands, picks) with one pick per read."""
+    count={}
+    for cmd,conv,bulk in reads:
+        if (bulk):
+            count[bulk[0]]=count.get(bulk[0],0)+1
+    cmds=[]
+    where={}
+    picks=[]
+    for cmd,conv,bulk in reads:
+        if (bulk and count[bulk[0]]>=bulkMin):
+            if (bulk[0] not in where):
+                where[bulk[0]]=len(cmds)
+                cmds.append(bulk[0])
+            picks.append((where[bulk[0]],bulk[1],bulk[2],conv))
+        else:
+            picks.append((len(cmds),None,None,conv))
+            cmds.append(cmd)
+    return cmds,picks
+
+def reading(text,conv):
+    """One reading converted with conv. The plates print floats with a decimal point
+    (or as nan/inf) and int readings are digital inputs, so a reply of another shape,
+    e.g. the answer to a different command, raises ValueError instead of being logged."""
+    text=text.strip()
+    if (conv==float and '.' not in text and text.lower().lstrip('-+') not in ('nan','inf') and 'e' not in text.lower()):
+        raise ValueError('not a float reading: '+text)
+    val=conv(text)
+    if (conv==int and val not in (0,1)):
+        raise ValueError('not a bit: '+text)
+    return val
+
+def unpack(resp,picks):
+    """Split the replies to planReads() commands back out into one value per read.
+    A read whose reply is missing (None) or does not have the shape of its command's
+    reply (see reading()) comes back as None."""
+    split={}
+    vals=list(range(len(picks)))
+    for k in range(len(picks)):
+        ci,kind,idx,conv=picks[k]
+        vals[k]=None
+        if (resp[ci]==None):
+            continue
+        try:
+            if (kind==None):
+                vals[k]=reading(resp[ci],conv)
+                continue
+            if (ci not in split):
+                if (kind=='list' and not resp[ci].startswith('[')):
+                    raise ValueError('not a list reply: '+resp[ci])
+                split[ci]=parseList(resp[ci]) if kind=='list' else int(resp[ci])
+            if (kind=='list'):
+                vals[k]=reading(split[ci][idx],conv)
+            else:
+                vals[k]=conv((split[ci]>>idx)&1)
+        except (ValueError, IndexError):
+            pass
+    return vals
+
+
+class Scheduler:
+    """Fires on absolute deadlines of the monotonic clock so periods never pick up
+    rounding or processing delays. A tick that runs past the next deadline is an
+    overrun; the deadlines it covered are skipped and counted, and the schedule
+    resumes on the original timeline."""
+    def __init__(self,period):
+        self.period=period
+        self.next=time.monotonic()
+        self.resetStats()
+
+    def resetStats(self):
+        self.ticks=0
+        self.overruns=0
+        self.skipped=0
+        self.jitter=0.0         #lateness of the most recent tick in seconds
+        self.maxJitter=0.0
+        self.sumJitter=0.0
+
+    def setPeriod(self,period):
+        if (period!=self.period):
+            self.next+=period-self.period
+            self.period=period
+
+    def delay(self):
+        return self.next-time.monotonic()
+
+    def begin(self):
+        """Start a tick and return its monotonic start time"""
+        now=time.monotonic()
+        self.jitter=now-self.next
+        self.maxJitter=max(self.maxJitter,self.jitter)
+        self.sumJitter+=self.jitter
+        self.ticks+=1
+        return now
+
+    def end(self):
+        """Finish a tick and return the list of deadlines it overran"""
+        self.next+=self.period
+        now=time.monotonic()
+        missed=[]
+        if (now>self.next):
+            self.overruns+=1
+            while (now>self.next):
+                missed.append(self.next)
+                self.next+=self.period
+            self.skipped+=len(missed)
+        return missed
+
+    def meanJitter(self):
+        if (self.ticks==0):
+            return 0.0
+        return self.sumJitter/self.ticks
+
+
+CAL_PASSES=3            #acquisition passes timed when the channel selection changes
+CAL_MARGIN=1.25         #head room added to the slowest calibration pass
+MIN_PERIOD=0.01         #floor for the calibrated minimum sample period
+
+
+class AcqEngine(threading.Thread):
+    """Acquisition thread. Walks the current plan on every Scheduler deadline and puts
+    finished rows of (planId, timestamp, values) on a bounded queue. Deadlines lost
+    to an overrun are queued as rows with values of None so the log keeps them.
+    The plan is built by planReads() from the reads of the selected channels.
+    A read can be given its own rate as a number of base periods between its
+    samples: reads sharing a rate form a group with its own commands and each
+    tick sends only the groups that are due. Values of reads that were not due
+    are NOT_DUE, and a tick with nothing due is passed over without a row.
+    With skew set, each row also gets one value per plate (see readPlates()):
+    the seconds from the row timestamp to the arrival of that plate's last reply,
+    which shows how much later than the stamp the plate was actually read.
+    Row timestamps are the monotonic start of each tick mapped onto the wall
+    clock once, so they are exact to the microsecond relative to each other and
+    never step when the system clock is adjusted.
+    Every new plan is calibrated first: a few back to back passes over all
+    groups are timed and minPeriod is set from the slowest one. Engines given the same epoch (a
+    monotonic time) and period sample on one shared grid of deadlines, which
+    RowMerger relies on to join their rows."""
+    def __init__(self,bridge,period,depth=256,epoch=None):
+        threading.Thread.__init__(self,name='AcqEngine',daemon=True)
+        self.bridge=bridge
+        self.period=period
+        self.rows=queue.Queue(depth)
+        self.lock=threading.Lock()
+        self.plan=([],0,None)
+        self.planId=0
+        self.multiRate=False
+        self.width=0        #values per row
+        self.dropped=0      #rows thrown away because nobody drained the queue
+        self.sched=Scheduler(period)
+        self.minPeriod=MIN_PERIOD
+        self.calPending=True
+        self.resetPending=False
+        self.anchor=time.time()-time.monotonic()   #maps monotonic times onto the wall clock
+        self.epoch=epoch
+        self.stopped=threading.Event()
+
+    def setPlan(self,reads,every=None,skew=False):
+        """Make reads the plan for the following rows and return its planId.
+        every holds the base periods between samples of each read (default 1).
+        skew appends the per-plate read time columns to every row."""
+        if (every==None):
+            every=[1]*len(reads)
+        groups=[]
+        for n in sorted(set(every)):
+            cols=[k for k in range(len(reads)) if every[k]==n]
+            cmds,picks=planReads([reads[k] for k in cols])
+            groups.append((n,cols,cmds,picks))
+        plates=None
+        if (skew):
+            plates=readPlates([cmd for cmd,conv,bulk in reads])
+            plates=[[plateOf(reads[k][0])==plate for k in range(len(reads))] for plate in plates]
+        with self.lock:
+            self.plan=(groups,len(reads),plates)
+            self.width=len(reads)+(len(plates) if plates else 0)
+            self.multiRate=len(groups)>1 or (len(groups)==1 and groups[0][0]>1)
+            self.planId+=1
+            self.calPending=True
+            return self.planId
+
+    def setPeriod(self,period):
+        with self.lock:
+            self.period=period
+
+    def recalibrate(self):
+        with self.lock:
+            self.calPending=True
+
+    def calibrate(self,groups,width,plates):
+        """Time CAL_PASSES passes over the plan and derive the minimum sample period"""
+        slowest=0.0
+        for k in range(CAL_PASSES):
+            t0=time.monotonic()
+            self.read(groups,width,plates,t0)
+            slowest=max(slowest,time.monotonic()-t0)
+        self.minPeriod=max(MIN_PERIOD,round(slowest*CAL_MARGIN,3))
+
+    def calibrateNow(self):
+        """Calibrate the current plan on the calling thread, before the engine is started"""
+        with self.lock:
+            plan=self.plan
+            self.calPending=False
+        self.calibrate(*plan)
+
+    def resetStats(self):
+        with self.lock:
+            self.resetPending=True
+
+    def stats(self):
+        """Scheduler counters: (ticks, overruns, skipped, last jitter, mean jitter, max jitter)"""
+        s=self.sched
+        return (s.ticks,s.overruns,s.skipped,s.jitter,s.meanJitter(),s.maxJitter)
+
+    def stop(self):
+        self.stopped.set()
+
+    def read(self,due,width,plates,start):
+        """One pass over the groups in due, sent as a single batch. Returns width values,
+        followed by the read time of each plate after start if plates is given."""
+        if (len(due)==1 and len(due[0][1])==width and plates==None):
+            return unpack(self.bridge.batch(due[0][2]),due[0][3])
+        cmds=[]
+        for n,cols,groupCmds,picks in due:
+            cmds+=groupCmds
+        times=[None]*len(cmds) if plates else None
+        resp=self.bridge.batch(cmds,times=times)
+        vals=[NOT_DUE]*width
+        arrived=[None]*width        #reply time of each read
+        at=0
+        for n,cols,groupCmds,picks in due:
+            part=unpack(resp[at:at+len(groupCmds)],picks)
+            for k in range(len(cols)):
+                vals[cols[k]]=part[k]
+                if (times):
+                    arrived[cols[k]]=times[at+picks[k][0]]
+            at+=len(groupCmds)
+        if (plates):
+            for onPlate in plates:
+                cols=[k for k in range(width) if onPlate[k] and vals[k] is not NOT_DUE]
+                if (len(cols)==0):
+                    vals.append(NOT_DUE)
+                    continue
+                last=[arrived[k] for k in cols if arrived[k]!=None]
+                vals.append(round(max(last)-start,6) if len(last)>0 else None)
+        return vals
+
+    def run(self):
+        sched=self.sched
+        sched.next=time.monotonic()
+        gridPeriod=None
+        tick=0      #base periods since the start of the timeline; picks the groups that are due
+        while (not self.stopped.is_set()):
+            with self.lock:
+                plan=self.plan
+                planId=self.planId
+                sched.setPeriod(self.period)
+                if (self.resetPending):
+                    sched.resetStats()
+                    self.dropped=0
+                    self.resetPending=False
+                calPending=self.calPending
+                self.calPending=False
+            if (calPending):
+                try:
+                    self.calibrate(*plan)
+                except (ValueError, IndexError, serial.SerialException) as e:
+                    print(f"Calibration error: {e}")
+                sched.next=time.monotonic()     #calibration is not part of the sample timeline
+                tick=0
+            if (self.epoch!=None and (calPending or sched.period!=gridPeriod)):
+                gridPeriod=sched.period     #resume on the next deadline of the shared grid
+                tick=max(0,math.ceil((time.monotonic()-self.epoch)/gridPeriod))
+                sched.next=self.epoch+tick*gridPeriod
+            groups,width,plates=plan
+            due=[g for g in groups if tick%g[0]==0]
+            if (len(due)==0 and len(groups)>0):
+                sched.next+=sched.period        #nothing is due on this tick
+                tick+=1
+                continue
+            wait=sched.delay()
+            if (wait>0 and self.stopped.wait(wait)):
+                break
+            start=sched.begin()
+            try:
+                vals=self.read(due,width,plates,start)
+                self.put((planId,self.anchor+start,vals))
+            except (ValueError, IndexError, serial.SerialException) as e:
+                print(f"Acquisition error: {e}")
+                self.put((planId,self.anchor+start,None))
+            for deadline in sched.end():
+                tick+=1
+                if (len(groups)==0 or any(tick%g[0]==0 for g in groups)):
+                    self.put((planId,self.anchor+deadline,None))
+            tick+=1
+
+    def put(self,row):
+        """Queue a row, discarding the oldest one if the GUI has fallen behind"""
+        while True:
+            try:
+                self.rows.put_nowait(row)
+                return
+            except queue.Full:
+                try:
+                    self.rows.get_nowait()
+                    self.dropped+=1
+                except queue.Empty:
+                    pass
+
+    def drain(self):
+        """Return every row waiting in the queue (called from the GUI thread)"""
+        out=[]
+        while True:
+            try:
+                out.append(self.rows.get_nowait())
+            except queue.Empty:
+                return out
+
+
+class RowMerger:
+    """Joins the rows of several AcqEngines that sample on one shared grid (same
+    epoch and period) into single log rows. Each row is placed on its grid tick
+    and a tick is handed out once every engine has delivered it or a later one,
+    or once it is lag ticks behind the newest tick seen, so a stalled bridge
+    cannot hold up the log. widths gives the number of values per engine; an
+    engine with no row for a tick contributes None values, or NOT_DUE ones if it
+    runs a multi-rate plan and simply had nothing due. Rows come out as
+    (timestamp, values) stamped with the earliest start among the engines."""
+    def __init__(self,engines,widths,period,epoch,lag=10):
+        self.engines=engines
+        self.widths=widths
+        self.period=period
+        self.epoch=epoch
+        self.lag=lag
+        self.pending={}
+        self.latest=[-1]*len(engines)
+        self.next=0
+        self.late=0         #rows that arrived after their tick was handed out
+
+    def setPeriod(self,period):
+        """Follow a change of the engines' period; ticks already counted are rescaled onto the new grid"""
+        scale=self.period/period
+        self.period=period
+        self.next=int(self.next*scale)
+        self.latest=[int(t*scale) for t in self.latest]
+        pending={}
+        for tick,parts in self.pending.items():
+            pending[int(tick*scale)]=parts
+        self.pending=pending
+
+    def drain(self):
+        for k in range(len(self.engines)):
+            eng=self.engines[k]
+            for planId,stamp,vals in eng.drain():
+                if (planId!=eng.planId):
+                    continue
+                tick=int(round((stamp-eng.anchor-self.epoch)/self.period))
+                if (tick<self.next):
+                    self.late+=1
+                    continue
+                self.pending.setdefault(tick,[None]*len(self.engines))[k]=(stamp,vals)
+                self.latest[k]=max(self.latest[k],tick)
+        out=[]
+        newest=max(self.latest)
+        while (len(self.pending)>0):
+            tick=min(self.pending)
+            if (min(self.latest)<tick and newest-tick<self.lag):
+                break
+            parts=self.pending.pop(tick)
+            vals=[]
+            for k in range(len(parts)):
+                if (parts[k]==None and self.engines[k].multiRate):
+                    vals+=[NOT_DUE]*self.widths[k]
+                elif (parts[k]==None or parts[k][1]==None):
+                    vals+=[None]*self.widths[k]
+                else:
+                    vals+=parts[k][1]
+            out.append((min(p[0] for p in parts if p!=None),vals))
+            self.next=tick+1
+        return out
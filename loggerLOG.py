@@ -0,0 +1,611 @@
+"""
+File: loggerLOG.py
+Description: Log file writers for PIPLATElogger. Rows are handed over from the GUI (or any
+other producer) without blocking and formatted and written to disk on a background thread.
+Two formats exist: the original CSV layout and a compact binary format (.plb) that
+loggerCONVERT.py turns back into the same CSV. Either can be streamed through a
+compression codec (see CODECS). RateLog lays out the rows of a multi-rate plan and
+ChangeFormat only writes the values that have changed.
+"""
+
+import io
+import os
+import gzip
+import math
+import zlib
+import json
+import time
+import queue
+import struct
+import datetime
+import threading
+
+from loggerROW import NOT_DUE
+
+STAMP_FORMAT='%Y-%m-%d-%H:%M:%S'
+UTC_FORMAT='%Y-%m-%dT%H:%M:%S.%fZ'
+STAMP_COLUMNS={'local':'Date/Time','utc':'Date/Time (UTC)','epoch':'Epoch Time (s)'}     #CSV timestamp styles and their column name
+KEYFRAME_SECS=60.0      #default seconds between full rows of a change-driven log
+READ_TIME_DEADBAND=0.001    #default deadband of the per-plate read time columns in a change-driven log
+LAYOUTS=['dense','sparse','streams']    #RateLog layouts
+CHANGE_STAMPS='utc'     #stamps of a change-driven CSV log set to 'local', which has only whole seconds
+
+
+class Codec:
+    """Plain files. A codec opens a log file for binary writing; its flush() must
+    leave everything written so far readable even if the process is killed."""
+    ext=''
+
+    def open(self,path):
+        return open(path,'wb')
+
+    def reader(self,path):
+        return open(path,'rb')
+
+
+class GzipCodec(Codec):
+    ext='.gz'
+
+    def __init__(self,level=6):
+        self.level=level
+
+    def open(self,path):
+        return gzip.GzipFile(path,'wb',self.level)     #flush() writes a Z_SYNC_FLUSH point
+
+    def reader(self,path):
+        return io.BufferedReader(GzipTail(open(path,'rb')))
+
+
+class GzipTail(io.RawIOBase):
+    """Decompresses a gzip file that may have been cut off, e.g. by a logger that
+    was killed. gzip.open raises EOFError at a missing end of stream; here the data
+    decoded up to that point is returned and the end of the file is taken as the end
+    of the log. A cut-off last record is left for the log reader to ignore."""
+    def __init__(self,f):
+        self.file=f
+        self.z=zlib.decompressobj(16+zlib.MAX_WBITS)
+        self.buf=b''
+
+    def readable(self):
+        return True
+
+    def readinto(self,b):
+        while (len(self.buf)==0):
+            if (self.z.eof):                #end of one gzip member; another may follow
+                data=self.z.unused_data or self.file.read(65536)
+                if (len(data)==0):
+                    return 0
+                self.z=zlib.decompressobj(16+zlib.MAX_WBITS)
+            else:
+                data=self.file.read(65536)
+                if (len(data)==0):
+                    return 0                #cut off before the end of the stream
+            self.buf=self.z.decompress(data)
+        n=min(len(b),len(self.buf))
+        b[:n]=self.buf[:n]
+        self.buf=self.buf[n:]
+        return n
+
+    def close(self):
+        self.file.close()
+        io.RawIOBase.close(self)
+
+
+CODECS={'none':Codec(),'gzip':GzipCodec()}
+
+def registerCodec(name,codec):
+    """Make another Codec available to the logger under name"""
+    CODECS[name]=codec
+
+def codecFor(path):
+    """The codec that wrote path, judged by its extension"""
+    for codec in CODECS.values():
+        if (codec.ext and path.endswith(codec.ext)):
+            return codec
+    return CODECS['none']
+
+
+def stampText(stamp,style='local'):
+    """stamp (epoch seconds) as text: 'local' is the original local time to the
+    second, 'utc' ISO 8601 UTC to the microsecond and 'epoch' seconds with six decimals"""
+    if (stamp==None):
+        return ''
+    if (style=='utc'):
+        return datetime.datetime.fromtimestamp(stamp,datetime.timezone.utc).strftime(UTC_FORMAT)
+    if (style=='epoch'):
+        return '%.6f' % stamp
+    return datetime.datetime.fromtimestamp(stamp).strftime(STAMP_FORMAT)
+
+def parseStamp(text):
+    """Epoch seconds of a stampText() string of any style, or None for a blank one"""
+    if (text==''):
+        return None
+    if (text.endswith('Z')):
+        return datetime.datetime.strptime(text,UTC_FORMAT).replace(tzinfo=datetime.timezone.utc).timestamp()
+    if (text.count('-')<2):
+        return float(text)
+    return datetime.datetime.strptime(text,STAMP_FORMAT).timestamp()
+
+
+class CsvFormat:
+    """The CSV layout StartLog() has always written: a header line followed by
+    one line per sample with a local Date/Time stamp. Blank cells mark samples
+    lost to an overrun and single reads that failed. stamps selects another
+    timestamp style of stampText(), which also renames the first column."""
+    def __init__(self,header,stamps='local'):
+        if (stamps not in STAMP_COLUMNS):
+            stamps='local'
+        self.stamps=stamps
+        names=header.split(',')
+        self.csvHeader=','.join([STAMP_COLUMNS[stamps]]+names[1:])
+
+    def header(self):
+        return (self.csvHeader+os.linesep).encode('utf-8')
+
+    def row(self,stamp,vals):
+        if (vals==None):
+            cells=','*max(1,self.csvHeader.count(','))
+        else:
+            cells=','+','.join('' if v==None else str(v) for v in vals) if len(vals)>0 else ','
+        return (stampText(stamp,self.stamps)+cells+os.linesep).encode('utf-8')
+
+
+BIN_MAGIC=b'PIPLOG1\n'
+BIN_TYPES={'f8':('d',float('nan')),'i1':('b',-1)}      #struct code and the value stored for a lost sample
+
+class BinaryFormat:
+    """Fixed-width binary records. The file starts with BIN_MAGIC, a little-endian
+    uint32 length and a JSON header naming every column and its type ('f8' for
+    analog values, 'i1' for digital bits) plus the CSV header line. Each record is
+    a float64 epoch timestamp (UTC seconds) followed by the columns. Lost samples
+    and failed reads hold NaN or -1."""
+    def __init__(self,header,types):
+        self.csvHeader=header
+        self.columns=[{'name':n,'type':t} for n,t in zip(header.split(',')[1:],types)]
+        self.struct=struct.Struct('<d'+''.join(BIN_TYPES[t][0] for t in types))
+        self.blank=[BIN_TYPES[t][1] for t in types]
+
+    def header(self):
+        meta=json.dumps({'version':1,'timestamp':'f8 epoch seconds UTC','columns':self.columns,
+                         'csv_header':self.csvHeader}).encode('utf-8')
+        return BIN_MAGIC+struct.pack('<I',len(meta))+meta
+
+    def row(self,stamp,vals):
+        if (vals==None):
+            vals=self.blank
+        elif (None in vals):
+            vals=[self.blank[k] if vals[k]==None else vals[k] for k in range(len(vals))]
+        return self.struct.pack(stamp,*vals)
+
+
+class ChangeFormat:
+    """Change-driven logging on top of a CsvFormat or BinaryFormat. A value is
+    only written when it has moved more than deadband[k] away from the value last
+    written for its column (a deadband of 0 writes any change, which suits
+    digital inputs) and a row only when at least one value is written. A
+    keyframe row holding every value starts each segment and follows every
+    keyframeSecs seconds, so a log can be read from any keyframe. CSV logs get a
+    Kind column after Date/Time, K for keyframes and C for change rows; in these
+    logs a blank cell means unchanged and a failed read is written as nan.
+    Binary records have no room to leave values out, so a binary log gets a whole
+    row whenever any value changes. ChangeReader and fillGrid() turn either back
+    into one row per sample, which needs stamps finer than a second, so a CSV
+    log asked for local stamps gets CHANGE_STAMPS ones."""
+    def __init__(self,fmt,deadband,keyframeSecs=KEYFRAME_SECS):
+        self.csv=isinstance(fmt,CsvFormat)
+        if (self.csv):
+            names=fmt.csvHeader.split(',')
+            stamps=CHANGE_STAMPS if fmt.stamps=='local' else fmt.stamps
+            fmt=CsvFormat(','.join(names[:1]+['Kind']+names[1:]),stamps)
+        self.fmt=fmt
+        self.csvHeader=fmt.csvHeader
+        self.deadband=deadband
+        self.keyframeSecs=keyframeSecs
+        self.last=None          #values last written; None until the first keyframe
+        self.keyStamp=0.0
+
+    def header(self):
+        self.last=None          #every segment starts with a keyframe
+        return self.fmt.header()
+
+    def moved(self,old,new,band):
+        if (old==None or new==None):
+            return old!=new
+        return abs(new-old)>band
+
+    def row(self,stamp,vals):
+        if (vals==None):
+            vals=[None]*len(self.deadband)     #a lost sample is a failed read of every channel
+        if (len(vals)!=len(self.deadband)):
+            raise ValueError('a row of '+str(len(vals))+' values can not be logged to '+str(len(self.deadband))+' columns')
+        if (self.last==None or (self.keyframeSecs>0 and stamp-self.keyStamp>=self.keyframeSecs)):
+            self.last=[None if v is NOT_DUE else v for v in vals]
+            self.keyStamp=stamp
+            if (self.csv):
+                return self.fmt.row(stamp,['K']+['nan' if v==None else v for v in self.last])
+            return self.fmt.row(stamp,self.last)
+        cells=[NOT_DUE]*len(vals)
+        last=self.last
+        for k in range(len(vals)):
+            v=vals[k]
+            if (v is not NOT_DUE and self.moved(last[k],v,self.deadband[k])):
+                cells[k]=v
+                last[k]=v
+        if (all(v is NOT_DUE for v in cells)):
+            return b''
+        if (self.csv):
+            return self.fmt.row(stamp,['C']+['' if v is NOT_DUE else ('nan' if v==None else v) for v in cells])
+        return self.fmt.row(stamp,last)
+
+
+class ChangeReader:
+    """Reads a CSV log written through a ChangeFormat (or a plain CSV log) and
+    yields (stamp, values) with every value filled in from the last row that
+    wrote it, which is the log the logger would have written without change-driven
+    logging. Values are the CSV text; failed reads are None. names holds the column
+    names after the timestamp and stamps the timestamp style."""
+    def __init__(self,f):
+        self.file=f
+        names=f.readline().rstrip('\r\n').split(',')
+        self.stamps='local'         #timestamp style, judged by the name of the first column
+        for style,name in STAMP_COLUMNS.items():
+            if (names[0]==name):
+                self.stamps=style
+        self.changes=len(names)>1 and names[1]=='Kind'
+        self.names=names[2:] if self.changes else names[1:]
+
+    def __iter__(self):
+        last=[None]*len(self.names)
+        for line in self.file:
+            if (not line.endswith('\n')):
+                break       #last line cut off by a crash
+            cells=line.rstrip('\r\n').split(',')
+            stamp=parseStamp(cells[0])
+            if (not self.changes):
+                yield stamp,[None if v=='' else v for v in cells[1:]]
+                continue
+            keyframe=cells[1]=='K'
+            for k in range(len(last)):
+                v=cells[k+2] if k+2<len(cells) else ''
+                if (keyframe or v!=''):
+                    last[k]=None if (v=='nan' or v=='') else v
+            yield stamp,list(last)
+
+def fillGrid(rows,period):
+    """Expand (stamp, values) rows, where a row holds until the next one, into one
+    row every period seconds from the first stamp. The rows of a binary log
+    written through a ChangeFormat, or those of a ChangeReader, give the dense
+    series the logger sampled."""
+    t=None
+    prev=None
+    for stamp,vals in rows:
+        if (t==None):
+            t=stamp
+        while (prev!=None and t<stamp-period/2):
+            yield t,prev
+            t+=period
+        prev=vals
+    if (prev!=None):
+        yield t,prev
+
+
+class BinaryReader:
+    """Streams the records of a binary log. header holds the decoded JSON header
+    and each iteration yields (stamp, values) with lost samples as None."""
+    def __init__(self,f,chunk=4096):
+        if (f.read(len(BIN_MAGIC))!=BIN_MAGIC):
+            raise ValueError('not a PIPLATElogger binary log')
+        size=struct.unpack('<I',f.read(4))[0]
+        self.header=json.loads(f.read(size).decode('utf-8'))
+        types=[c['type'] for c in self.header['columns']]
+        self.struct=struct.Struct('<d'+''.join(BIN_TYPES[t][0] for t in types))
+        self.ints=[t=='i1' for t in types]
+        self.file=f
+        self.chunk=chunk
+
+    def __iter__(self):
+        size=self.struct.size
+        while True:
+            data=self.file.read(size*self.chunk)
+            n=len(data)//size       #a record cut short by a crash is ignored
+            for rec in self.struct.iter_unpack(data[:n*size]):
+                vals=list(rec[1:])
+                for k in range(len(vals)):
+                    if ((self.ints[k] and vals[k]==-1) or (not self.ints[k] and math.isnan(vals[k]))):
+                        vals[k]=None
+                yield rec[0],vals
+            if (len(data)<size*self.chunk):
+                return
+
+
+class Rotation:
+    """When a log rolls over to a new segment: after maxBytes bytes, after maxSecs
+    seconds of samples, or when the sample time crosses an 'hour' or 'day'
+    boundary of the local clock. A rule set to 0 or None is off. Segments are
+    named run-0001.csv, run-0002.csv, ... next to a run-manifest.csv listing them."""
+    BOUNDARIES={'hour':'%Y%m%d%H','day':'%Y%m%d'}
+
+    def __init__(self,maxBytes=0,maxSecs=0,boundary=None):
+        self.maxBytes=maxBytes
+        self.maxSecs=maxSecs
+        self.boundary=boundary if boundary in self.BOUNDARIES else None
+
+    def enabled(self):
+        return bool(self.maxBytes or self.maxSecs or self.boundary)
+
+    def due(self,start,size,stamp):
+        """True if a row stamped stamp belongs in a new segment"""
+        if (self.maxBytes and size>=self.maxBytes):
+            return True
+        if (self.maxSecs and stamp-start>=self.maxSecs):
+            return True
+        if (self.boundary):
+            key=self.BOUNDARIES[self.boundary]
+            return datetime.datetime.fromtimestamp(stamp).strftime(key)!=datetime.datetime.fromtimestamp(start).strftime(key)
+        return False
+
+    def segmentPath(self,path,n):
+        root,ext=os.path.splitext(path)
+        return root+'-'+str(n).zfill(4)+ext
+
+    def manifestPath(self,path):
+        return os.path.splitext(path)[0]+'-manifest.csv'
+
+
+class LogWriter(threading.Thread):
+    """Formats and writes log rows on its own thread so a slow disk never stalls
+    sampling. fmt is a CsvFormat or BinaryFormat and rows are (stamp, values).
+    Rows are collected and written in one call once flushRows rows are waiting
+    or flushSecs seconds have passed since the last write. When fsyncSecs is
+    greater than zero the file is also fsync'ed at that interval, which bounds
+    how much data a crash or power cut can lose. With an enabled Rotation the
+    log is split into segments that each start with the header. codec (see CODECS)
+    compresses the output on this thread; every write ends with a sync point so
+    a log cut off by a crash still decompresses up to its last flush."""
+    def __init__(self,path,fmt,flushRows=100,flushSecs=1.0,fsyncSecs=0.0,rotation=None,codec=None):
+        threading.Thread.__init__(self,name='LogWriter',daemon=True)
+        self.path=path
+        self.fmt=fmt
+        self.rotation=rotation if (rotation and rotation.enabled()) else None
+        self.codec=codec or CODECS['none']
+        self.segments=[]        #[path, first stamp, last stamp, rows, bytes] per segment
+        self.flushRows=max(1,flushRows)
+        self.flushSecs=flushSecs
+        self.fsyncSecs=fsyncSecs
+        self.rows=queue.Queue()
+        self.error=None
+        self.written=0          #rows on disk (at least handed to the OS)
+        self.batches=0
+        self.lastWrite=0.0      #seconds taken by the most recent write
+        self.maxWrite=0.0
+        self.sumWrite=0.0
+        self.file=None
+        self.openSegment()
+        self.start()
+
+    def write(self,stamp,vals):
+        """Queue one sample; vals of None marks a lost sample. Never blocks."""
+        self.rows.put((stamp,vals))
+
+    def depth(self):
+        return self.rows.qsize()
+
+    def meanWrite(self):
+        if (self.batches==0):
+            return 0.0
+        return self.sumWrite/self.batches
+
+    def close(self):
+        """Write out everything still queued and close the file"""
+        self.rows.put(None)
+        self.join()
+
+    def run(self):
+        batch=[]
+        lastFlush=time.monotonic()
+        lastSync=lastFlush
+        done=False
+        while (not done):
+            timeout=None        #nothing pending: sleep until the next row arrives
+            if (len(batch)>0):
+                timeout=max(0.0,lastFlush+self.flushSecs-time.monotonic())
+            try:
+                row=self.rows.get(timeout=timeout)
+                if (row==None):
+                    done=True
+                else:
+                    batch.append(row)
+                    while (len(batch)<self.flushRows):
+                        row=self.rows.get_nowait()
+                        if (row==None):
+                            done=True
+                            break
+                        batch.append(row)
+            except queue.Empty:
+                pass
+            now=time.monotonic()
+            if (len(batch)>=self.flushRows or now-lastFlush>=self.flushSecs or done):
+                if (len(batch)>0):
+                    self.flush(batch)
+                    batch=[]
+                lastFlush=now
+                if (self.fsyncSecs>0 and (now-lastSync>=self.fsyncSecs or done)):
+                    self.sync()
+                    lastSync=now
+        try:
+            self.file.close()
+            if (self.rotation):
+                self.writeManifest()
+        except Exception as e:
+            self.error=e
+
+    def openSegment(self):
+        path=self.path
+        if (self.rotation):
+            path=self.rotation.segmentPath(self.path,len(self.segments)+1)
+        path=path+self.codec.ext
+        header=self.fmt.header()
+        self.file=self.codec.open(path)
+        self.file.write(header)
+        self.segments.append([path,None,None,0,len(header)])
+
+    def roll(self):
+        """Close the current segment and start the next one"""
+        if (self.fsyncSecs>0):
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.file.close()
+        self.openSegment()
+        self.writeManifest()
+
+    def writeManifest(self):
+        lines=['Segment,Start,End,Rows,Bytes']
+        for path,first,last,rows,size in self.segments:
+            lines.append(os.path.basename(path)+','+stampText(first)+','+stampText(last)+','+str(rows)+','+str(size))
+        with open(self.rotation.manifestPath(self.path),'w') as f:
+            f.write('\n'.join(lines)+'\n')
+
+    def flush(self,batch):
+        if (self.error):
+            return
+        t0=time.monotonic()
+        rows=0
+        try:
+            chunk=[]
+            seg=self.segments[-1]
+            for stamp,vals in batch:
+                if (self.rotation and seg[3]>0 and self.rotation.due(seg[1],seg[4],stamp)):
+                    self.file.write(b''.join(chunk))
+                    chunk=[]
+                    self.roll()
+                    seg=self.segments[-1]
+                data=self.fmt.row(stamp,vals)
+                if (len(data)==0):
+                    continue        #a ChangeFormat row with nothing to write
+                chunk.append(data)
+                rows+=1
+                if (seg[3]==0):
+                    seg[1]=stamp
+                seg[2]=stamp
+                seg[3]+=1
+                seg[4]+=len(data)
+            self.file.write(b''.join(chunk))
+            self.file.flush()
+        except Exception as e:      #a disk error, or a row the format can't encode; either way the log stops
+            self.error=e
+            return
+        dt=time.monotonic()-t0
+        self.written+=rows
+        self.batches+=1
+        self.lastWrite=dt
+        self.maxWrite=max(self.maxWrite,dt)
+        self.sumWrite+=dt
+
+    def sync(self):
+        if (self.error):
+            return
+        try:
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            self.error=e
+
+
+def formatFor(path,names,types,deadband=None,keyframeSecs=KEYFRAME_SECS,stamps='local'):
+    """BinaryFormat for a .plb path, CsvFormat with the stamps timestamp style
+    otherwise. names are the column names after Date/Time and types their
+    BinaryFormat types. With a deadband per column the format is wrapped in a
+    ChangeFormat."""
+    header='Date/Time,'+','.join(names)
+    if (path.endswith('.plb')):
+        fmt=BinaryFormat(header,types)
+    else:
+        fmt=CsvFormat(header,stamps)
+    if (deadband!=None):
+        fmt=ChangeFormat(fmt,deadband,keyframeSecs)
+    return fmt
+
+def streamPath(path,every):
+    root,ext=os.path.splitext(path)
+    return root+'-every'+str(every)+ext
+
+
+class RateLog:
+    """Writes the rows of a multi-rate plan, where column k is sampled every
+    every[k] base periods and holds NOT_DUE on the rows in between. layout is
+    'dense' (every row has every column, a column that was not due repeats its
+    last reading), 'sparse' (cells that were not due are left blank, the same as
+    a failed read) or 'streams' (one file per rate, run-every1.csv,
+    run-every10.csv, ..., holding only its own columns and the rows on which
+    they were sampled). deadband, keyframeSecs and stamps are passed on to
+    formatFor(). The remaining arguments go to each LogWriter. It has the
+    counters of a LogWriter so the logger can use either one."""
+    def __init__(self,path,names,types,every,layout,*args,deadband=None,keyframeSecs=KEYFRAME_SECS,stamps='local',**kwargs):
+        self.layout=layout if layout in LAYOUTS else 'dense'
+        self.changes=deadband!=None
+        self.last=[None]*len(every)
+        self.streams=[]         #(columns or None for all, LogWriter) with the fastest rate first
+        if (self.layout=='streams'):
+            for n in sorted(set(every)):
+                cols=[k for k in range(len(every)) if every[k]==n]
+                fmt=formatFor(path,[names[k] for k in cols],[types[k] for k in cols],
+                              None if deadband==None else [deadband[k] for k in cols],keyframeSecs,stamps)
+                self.streams.append((cols,LogWriter(streamPath(path,n),fmt,*args,**kwargs)))
+        else:
+            fmt=formatFor(path,names,types,deadband,keyframeSecs,stamps)
+            self.streams.append((None,LogWriter(path,fmt,*args,**kwargs)))
+        self.writers=[w for cols,w in self.streams]
+
+    def write(self,stamp,vals):
+        if (vals==None):
+            for w in self.writers:
+                w.write(stamp,None)
+        elif (self.layout=='streams'):
+            for cols,w in self.streams:
+                if (vals[cols[0]] is not NOT_DUE):
+                    part=[vals[k] for k in cols]
+                    if (not self.changes):
+                        part=[None if v is NOT_DUE else v for v in part]    #a read time column of a plate that was not due
+                    w.write(stamp,part)
+        elif (self.layout=='sparse' and self.changes):
+            self.writers[0].write(stamp,vals)       #ChangeFormat takes NOT_DUE as unchanged
+        elif (self.layout=='sparse'):
+            self.writers[0].write(stamp,[None if v is NOT_DUE else v for v in vals])
+        else:
+            last=self.last
+            for k in range(len(vals)):
+                if (vals[k] is not NOT_DUE):
+                    last[k]=vals[k]
+            self.writers[0].write(stamp,list(last))
+
+    def close(self):
+        for w in self.writers:
+            w.close()
+
+    def depth(self):
+        return sum(w.depth() for w in self.writers)
+
+    def meanWrite(self):
+        return max(w.meanWrite() for w in self.writers)
+
+    @property
+    def error(self):
+        for w in self.writers:
+            if (w.error):
+                return w.error
+        return None
+
+    @property
+    def segments(self):
+        return self.writers[0].segments
+
+    @property
+    def written(self):
+        return sum(w.written for w in self.writers)
+
+    @property
+    def batches(self):
+        return sum(w.batches for w in self.writers)
+
+    @property
+    def maxWrite(self):
+        return max(w.maxWrite for w in self.writers)
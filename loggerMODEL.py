@@ -0,0 +1,44 @@
+"""
+File: loggerMODEL.py
+Description: Channel state for PIPLATElogger kept in plain Python attributes. Acquisition, logging
+and plan building read and write these directly; the Tk widgets of a channel are only a view that
+copies user edits in and is refreshed from the model when the screen is redrawn.
+"""
+
+from loggerCHART import History
+
+
+class Channel:
+    """One logger channel. value is the latest reading converted with conv,
+    selected says whether it is sampled and logged, label is the name used in
+    the log header and history holds the last size readings for the trace.
+    pending counts readings posted since the view last drew them and failed
+    counts readings that did not arrive. every is the number of sample periods
+    between readings of the channel and deadband is how far its value must move
+    before it is logged again when only changes are logged."""
+    def __init__(self,label,conv,size):
+        self.label=label
+        self.conv=conv
+        self.selected=False
+        self.value=conv(0)
+        self.history=History(size)
+        self.pending=0
+        self.failed=0
+        self.every=1
+        self.deadband=0.0
+
+    def post(self,val):
+        """Record one reading. None marks a failed read; the trace holds the previous value."""
+        self.value=val
+        if (val==None):
+            self.failed+=1
+            val=self.history.latest()
+        self.history.append(val)
+        self.pending+=1
+        return self.value
+
+    def descriptor(self):
+        """The label if the channel is selected, otherwise ''"""
+        if (self.selected):
+            return self.label
+        return ''
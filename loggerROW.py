@@ -0,0 +1,7 @@
+"""
+File: loggerROW.py
+Description: Row values shared by the PIPLATElogger acquisition engine and log writers.
+Kept free of any imports so that neither side pulls in the other, or the drawing code.
+"""
+
+NOT_DUE=object()        #reading of a channel that was not due on a multi-rate row; RateLog removes it from the log